@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim: set fenc=utf-8 ai ts=4 sw=4 sts=4 et:
+#
+#
+# SPDX-FileCopyrightText: © 2026 Marcus Rowe <undisbeliever@gmail.com>
+# SPDX-License-Identifier: Zlib
+#
+# Copyright © 2026 Marcus Rowe <undisbeliever@gmail.com>
+#
+# This software is provided 'as-is', without any express or implied warranty.
+# In no event will the authors be held liable for any damages arising from the
+# use of this software.
+#
+# Permission is granted to anyone to use this software for any purpose, including
+# commercial applications, and to alter it and redistribute it freely, subject to
+# the following restrictions:
+#
+#    1. The origin of this software must not be misrepresented; you must not
+#       claim that you wrote the original software. If you use this software in
+#       a product, an acknowledgment in the product documentation would be
+#       appreciated but is not required.
+#
+#    2. Altered source versions must be plainly marked as such, and must not be
+#       misrepresented as being the original software.
+#
+#    3. This notice may not be removed or altered from any source distribution.
+
+
+
+
+# Tests the incremental checksum update of `tools/write-sfc-checksum.py`.
+
+
+import importlib.util
+import os.path
+import random
+import sys
+import tempfile
+import unittest
+
+
+TOOLS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tools')
+
+
+
+def load_checksum_module():
+    # write-sfc-checksum.py cannot be imported with an import statement
+    sys.path.insert(0, TOOLS_DIR)
+
+    spec = importlib.util.spec_from_file_location('write_sfc_checksum', os.path.join(TOOLS_DIR, 'write-sfc-checksum.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    return module
+
+
+checksum = load_checksum_module()
+
+
+
+class PatchSfcFileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.bank_size, self.header_offset, map_mode = checksum.MAPPINGS['lorom']
+        self.map_mode = map_mode
+
+        rom = bytearray(random.Random(1).randbytes(64 * 1024))
+
+        h = self.header_offset
+        rom[h : h + 13] = (6 * b'\x20') + bytes(7)
+        rom[h + 0x25] = map_mode
+        rom[h + 0x2a] = 0x33
+        rom[h + 0x2c : h + 0x30] = checksum.CHECKSUM_PLACEHOLDER
+
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+
+        self.sfc_filename = os.path.join(tmp_dir.name, 'test.sfc')
+        with open(self.sfc_filename, 'wb') as fp:
+            fp.write(rom)
+
+        checksum.write_sfc_checksum(self.sfc_filename, self.bank_size, self.header_offset, self.map_mode)
+
+
+    def read_rom(self):
+        with open(self.sfc_filename, 'rb') as fp:
+            return fp.read()
+
+
+    def patch(self, patches):
+        checksum.patch_sfc_file(self.sfc_filename, self.bank_size, self.header_offset, self.map_mode, patches)
+
+
+    def test_patch_updates_checksum(self):
+        h = self.header_offset
+
+        self.patch([ (0x1234, None, b'\x01\x02\x03'),
+                     (h - 2, None, b'\xff\xff'),
+                     (h + checksum.HEADER_SIZE, None, b'\x00\x00') ])
+
+        stored, expected = checksum.verify_sfc_checksum(self.sfc_filename, self.bank_size, self.header_offset,
+                                                         self.map_mode)
+        self.assertEqual(stored, expected)
+
+
+    def test_patches_cannot_overlap_the_header(self):
+        h = self.header_offset
+        rom = self.read_rom()
+
+        for patch in [ (h - 1, None, b'\x00\x00'),
+                       (h + 0x25, None, b'\x21'),
+                       (h + 0x2c, None, b'\x00\x00\xff\xff'),
+                       (h + checksum.HEADER_SIZE - 1, None, b'\x00') ]:
+            with self.assertRaisesRegex(RuntimeError, 'overlaps the internal header'):
+                self.patch([ (0x1234, None, b'\x01'), patch ])
+
+            self.assertEqual(self.read_rom(), rom)
+
+
+    def test_patches_cannot_overlap(self):
+        rom = self.read_rom()
+
+        with self.assertRaisesRegex(RuntimeError, 'overlaps the patch'):
+            self.patch([ (0x1234, None, b'\x01\x02'), (0x1235, None, b'\x03') ])
+
+        self.assertEqual(self.read_rom(), rom)
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim: set fenc=utf-8 ai ts=4 sw=4 sts=4 et:
+#
+#
+# SPDX-FileCopyrightText: © 2026 Marcus Rowe <undisbeliever@gmail.com>
+# SPDX-License-Identifier: Zlib
+#
+# Copyright © 2026 Marcus Rowe <undisbeliever@gmail.com>
+#
+# This software is provided 'as-is', without any express or implied warranty.
+# In no event will the authors be held liable for any damages arising from the
+# use of this software.
+#
+# Permission is granted to anyone to use this software for any purpose, including
+# commercial applications, and to alter it and redistribute it freely, subject to
+# the following restrictions:
+#
+#    1. The origin of this software must not be misrepresented; you must not
+#       claim that you wrote the original software. If you use this software in
+#       a product, an acknowledgment in the product documentation would be
+#       appreciated but is not required.
+#
+#    2. Altered source versions must be plainly marked as such, and must not be
+#       misrepresented as being the original software.
+#
+#    3. This notice may not be removed or altered from any source distribution.
+
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+from _snes import CONVERTER_VERSION
+
+
+DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+
+
+
+def _tmp_filename(filename):
+    return f"{ filename }.{ os.getpid() }.tmp"
+
+
+
+def write_output_file(filename, data):
+    """
+    Writes `data` to `filename`.  `data` is a bytes-like object or an iterable of bytes-like chunks.
+
+    The file is replaced (not overwritten in place) so a hardlinked cache entry is never modified.
+    """
+
+    tmp_filename = _tmp_filename(filename)
+
+    try:
+        with open(tmp_filename, 'wb') as fp:
+            if isinstance(data, (bytes, bytearray, memoryview)):
+                fp.write(data)
+            else:
+                for chunk in data:
+                    fp.write(chunk)
+        os.replace(tmp_filename, filename)
+    except:
+        if os.path.exists(tmp_filename):
+            os.unlink(tmp_filename)
+        raise
+
+
+
+class ConversionCache:
+    """
+    A content-addressed on-disk cache of converter outputs.
+
+    Each entry is a directory named after the hash of the converter inputs.
+    Entry directory mtimes record when an entry was last used, for LRU eviction.
+    """
+
+    def __init__(self, cache_dir, max_size=DEFAULT_MAX_SIZE):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+
+
+    def key(self, tool, input_files, options):
+        """ Returns the cache key for a conversion of `input_files` by `tool` with `options`. """
+
+        h = hashlib.sha256()
+
+        h.update(json.dumps([ CONVERTER_VERSION, tool, options ], sort_keys=True).encode('utf-8'))
+
+        for filename in input_files:
+            with open(filename, 'rb') as fp:
+                data = fp.read()
+
+            h.update(len(data).to_bytes(8, byteorder='little'))
+            h.update(data)
+
+        return h.hexdigest()
+
+
+    def _entry_dir(self, key):
+        return os.path.join(self.cache_dir, key[0:2], key)
+
+
+    def fetch(self, key, outputs):
+        """
+        Hardlinks (or copies) the cached outputs of `key` to the filenames in the `outputs` dict.
+
+        The outputs are touched, so they are newer than the inputs that caused the conversion.
+
+        Returns True on a cache hit.  An entry removed by another process while it is being
+        fetched is a cache miss.
+        """
+
+        entry_dir = self._entry_dir(key)
+
+        cached_files = { name: os.path.join(entry_dir, name) for name in outputs }
+
+        if not all(os.path.isfile(f) for f in cached_files.values()):
+            return False
+
+        for name, filename in outputs.items():
+            tmp_filename = _tmp_filename(filename)
+
+            if os.path.exists(tmp_filename):
+                os.unlink(tmp_filename)
+
+            try:
+                try:
+                    os.link(cached_files[name], tmp_filename)
+                except FileNotFoundError:
+                    return False
+                except OSError:
+                    shutil.copyfile(cached_files[name], tmp_filename)
+
+                os.replace(tmp_filename, filename)
+            except FileNotFoundError:
+                return False
+            finally:
+                if os.path.exists(tmp_filename):
+                    os.unlink(tmp_filename)
+
+            # A hardlink keeps the mtime of when the entry was stored
+            os.utime(filename)
+
+        # Mark the entry as recently used
+        try:
+            os.utime(entry_dir)
+        except FileNotFoundError:
+            pass
+
+        return True
+
+
+    def store(self, key, outputs):
+        """
+        Copies the files in the `outputs` dict into the cache, then evicts old entries.
+
+        If another process stores the same key at the same time, its entry is kept.
+        """
+
+        entry_dir = self._entry_dir(key)
+        parent_dir = os.path.dirname(entry_dir)
+
+        os.makedirs(parent_dir, exist_ok=True)
+
+        tmp_dir = tempfile.mkdtemp(dir=parent_dir, prefix='.tmp-')
+        try:
+            for name, filename in outputs.items():
+                shutil.copyfile(filename, os.path.join(tmp_dir, name))
+
+            if os.path.isdir(entry_dir):
+                shutil.rmtree(entry_dir, ignore_errors=True)
+
+            try:
+                os.rename(tmp_dir, entry_dir)
+            except OSError:
+                # Lost the race to another process storing the same key (same key, same outputs)
+                if not os.path.isdir(entry_dir):
+                    raise
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+        except:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+        self.prune(self.max_size)
+
+
+    def entries(self):
+        """ Returns a list of (mtime, size, entry_dir) tuples, oldest first. """
+
+        out = list()
+
+        if not os.path.isdir(self.cache_dir):
+            return out
+
+        for prefix in os.listdir(self.cache_dir):
+            prefix_dir = os.path.join(self.cache_dir, prefix)
+            if len(prefix) != 2 or not os.path.isdir(prefix_dir):
+                continue
+
+            for key in os.listdir(prefix_dir):
+                entry_dir = os.path.join(prefix_dir, key)
+                if key.startswith('.') or not os.path.isdir(entry_dir):
+                    continue
+
+                try:
+                    size = sum(e.stat().st_size for e in os.scandir(entry_dir) if e.is_file())
+                    out.append((os.stat(entry_dir).st_mtime, size, entry_dir))
+                except FileNotFoundError:
+                    # Removed by another process
+                    continue
+
+        out.sort()
+
+        return out
+
+
+    def stats(self):
+        """ Returns a dict containing the number of cache entries and their total size. """
+
+        entries = self.entries()
+
+        return {
+            'entries': len(entries),
+            'size': sum(e[1] for e in entries),
+            'max_size': self.max_size,
+        }
+
+
+    def prune(self, max_size):
+        """
+        Removes the least recently used entries until the cache is no larger than `max_size` bytes.
+
+        Returns the number of entries removed.
+        """
+
+        entries = self.entries()
+        total_size = sum(e[1] for e in entries)
+
+        n_removed = 0
+
+        for mtime, size, entry_dir in entries:
+            if total_size <= max_size:
+                break
+
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total_size -= size
+            n_removed += 1
+
+        return n_removed
+
@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim: set fenc=utf-8 ai ts=4 sw=4 sts=4 et:
+#
+#
+# SPDX-FileCopyrightText: © 2026 Marcus Rowe <undisbeliever@gmail.com>
+# SPDX-License-Identifier: Zlib
+#
+# Copyright © 2026 Marcus Rowe <undisbeliever@gmail.com>
+#
+# This software is provided 'as-is', without any express or implied warranty.
+# In no event will the authors be held liable for any damages arising from the
+# use of this software.
+#
+# Permission is granted to anyone to use this software for any purpose, including
+# commercial applications, and to alter it and redistribute it freely, subject to
+# the following restrictions:
+#
+#    1. The origin of this software must not be misrepresented; you must not
+#       claim that you wrote the original software. If you use this software in
+#       a product, an acknowledgment in the product documentation would be
+#       appreciated but is not required.
+#
+#    2. Altered source versions must be plainly marked as such, and must not be
+#       misrepresented as being the original software.
+#
+#    3. This notice may not be removed or altered from any source distribution.
+
+
+
+
+# Compressed output formats.
+#
+# Both formats are byte oriented so they can be decoded by a small 65816 routine.
+# Every block starts with a control byte:
+#
+#   RLE:
+#     0x00          end of data
+#     0x01 - 0x7f   `n` literal bytes follow
+#     0x80 - 0xff   the next byte is repeated `(n & 0x7f) + 3` times (3 - 130)
+#
+#   LZ77:
+#     0x00          end of data
+#     0x01 - 0x7f   `n` literal bytes follow
+#     0x80 - 0xff   copy `(n & 0x7f) + 4` bytes (4 - 131) from earlier in the output.
+#                   Followed by a 16 bit little-endian distance (1 - 65535) back from the
+#                   current output position.  The copy may overlap the bytes it writes
+#                   (it must be copied one byte at a time, ie, with `mvn`).
+
+
+import re
+
+
+MAX_LITERALS = 0x7f
+
+MIN_RUN = 3
+MAX_RUN = 0x7f + MIN_RUN
+
+# A 3 byte match is the same size as 3 literals
+MIN_MATCH = 4
+MAX_MATCH = 0x7f + MIN_MATCH
+MAX_DISTANCE = 0xffff
+
+# Maximum number of hash chain entries tested for each match
+MAX_CHAIN = 8
+
+# Stop searching the hash chain once a match is this long
+NICE_MATCH = 32
+
+# The NumPy hash chain is only built for inputs at least this large
+# (on smaller inputs importing NumPy takes longer than the NumPy chain saves)
+NUMPY_MIN_BYTES = 1024 * 1024
+
+
+_RUN_REGEX = re.compile(rb'(.)\1{%d,}' % (MIN_RUN - 1), re.DOTALL)
+
+
+
+def _write_literals(out, data, start, end):
+    while start < end:
+        n = min(end - start, MAX_LITERALS)
+        out.append(n)
+        out += data[start:start + n]
+        start += n
+
+
+
+def compress_rle(data):
+    data = bytes(data)
+
+    out = bytearray()
+    literals_start = 0
+
+    for m in _RUN_REGEX.finditer(data):
+        start, end = m.span()
+        value = data[start]
+
+        # A run split into blocks must not leave a remainder too short for a repeat block
+        while end - start >= MIN_RUN:
+            n = min(end - start, MAX_RUN)
+            if 0 < end - start - n < MIN_RUN:
+                n -= MIN_RUN
+
+            _write_literals(out, data, literals_start, start)
+            out.append(0x80 | (n - MIN_RUN))
+            out.append(value)
+
+            start += n
+            literals_start = start
+
+    _write_literals(out, data, literals_start, len(data))
+    out.append(0)
+
+    return out
+
+
+
+def decompress_rle(data):
+    out = bytearray()
+    pos = 0
+
+    try:
+        while True:
+            c = data[pos]
+            pos += 1
+
+            if c == 0:
+                break
+            elif c < 0x80:
+                if pos + c > len(data):
+                    raise IndexError
+                out += data[pos:pos + c]
+                pos += c
+            else:
+                out += bytes((data[pos],)) * ((c & 0x7f) + MIN_RUN)
+                pos += 1
+
+    except IndexError:
+        raise ValueError('RLE data is truncated')
+
+    return out
+
+
+
+def _import_numpy():
+    # Returns the numpy module, or None if NumPy is not installed
+
+    try:
+        import numpy
+    except ImportError:
+        return None
+
+    return numpy
+
+
+
+def _hash_chain_numpy(data):
+    # Returns a list of the previous position of the MIN_MATCH bytes at each position (or -1)
+
+    import numpy
+
+    n_keys = len(data) - MIN_MATCH + 1
+    prev = numpy.full(len(data), -1, dtype=numpy.int64)
+
+    if n_keys > 1:
+        d = numpy.frombuffer(data, dtype=numpy.uint8).astype(numpy.uint32)
+
+        keys = d[0:n_keys].copy()
+        for k in range(1, MIN_MATCH):
+            keys |= d[k:k + n_keys] << (8 * k)
+
+        # A stable sort keeps positions with the same key in order
+        order = numpy.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+
+        same = sorted_keys[1:] == sorted_keys[:-1]
+        prev[order[1:][same]] = order[:-1][same]
+
+    return prev.tolist()
+
+
+
+def compress_lz77(data):
+    """
+    Compresses `data` with a greedy LZ77 parser.
+
+    Matches are found with a hash chain of the previous positions of every MIN_MATCH byte sequence.
+    If `data` is at least NUMPY_MIN_BYTES long and NumPy is installed, the whole chain is built up front,
+    otherwise it is built as the data is parsed.
+    """
+
+    data = bytes(data)
+    n_bytes = len(data)
+
+    out = bytearray()
+    literals_start = 0
+
+    last_key_pos = n_bytes - MIN_MATCH
+
+    if n_bytes >= NUMPY_MIN_BYTES and _import_numpy() is not None:
+        prev = _hash_chain_numpy(data)
+        head = None
+    else:
+        prev = [ -1 ] * n_bytes
+        head = dict()
+        head_get = head.get
+
+    i = 0
+    while i <= last_key_pos:
+        if head is None:
+            p = prev[i]
+        else:
+            key = data[i:i + MIN_MATCH]
+            p = head_get(key, -1)
+
+            prev[i] = p
+            head[key] = i
+
+        best_len = 0
+        best_pos = 0
+
+        if p >= 0:
+            max_len = MAX_MATCH if i + MAX_MATCH <= n_bytes else n_bytes - i
+            min_pos = i - MAX_DISTANCE
+            depth = MAX_CHAIN
+
+            while p >= min_pos and depth:
+                depth -= 1
+
+                # Only test candidates that are longer than the current best match
+                if best_len == 0 or (data[p + best_len] == data[i + best_len]
+                                     and data[p:p + best_len] == data[i:i + best_len]):
+                    # Binary search the match length
+                    lo = best_len + 1 if best_len else MIN_MATCH
+                    hi = max_len
+                    while lo < hi:
+                        mid = (lo + hi + 1) >> 1
+                        if data[p:p + mid] == data[i:i + mid]:
+                            lo = mid
+                        else:
+                            hi = mid - 1
+
+                    best_len = lo
+                    best_pos = p
+
+                    if lo >= NICE_MATCH or lo == max_len:
+                        break
+
+                p = prev[p]
+                if p < 0:
+                    break
+
+        if best_len:
+            _write_literals(out, data, literals_start, i)
+
+            distance = i - best_pos
+            out.append(0x80 | (best_len - MIN_MATCH))
+            out.append(distance & 0xff)
+            out.append(distance >> 8)
+
+            end = i + best_len
+            if head is not None:
+                for j in range(i + 1, min(end, last_key_pos + 1)):
+                    key = data[j:j + MIN_MATCH]
+                    prev[j] = head_get(key, -1)
+                    head[key] = j
+
+            i = literals_start = end
+        else:
+            i += 1
+
+    _write_literals(out, data, literals_start, n_bytes)
+    out.append(0)
+
+    return out
+
+
+
+def decompress_lz77(data):
+    out = bytearray()
+    pos = 0
+
+    try:
+        while True:
+            c = data[pos]
+            pos += 1
+
+            if c == 0:
+                break
+            elif c < 0x80:
+                if pos + c > len(data):
+                    raise IndexError
+                out += data[pos:pos + c]
+                pos += c
+            else:
+                length = (c & 0x7f) + MIN_MATCH
+                distance = data[pos] | (data[pos + 1] << 8)
+                pos += 2
+
+                if distance == 0 or distance > len(out):
+                    raise ValueError(f"Invalid LZ77 distance ({ distance })")
+
+                start = len(out) - distance
+                if distance >= length:
+                    out += out[start:start + length]
+                else:
+                    for j in range(start, start + length):
+                        out.append(out[j])
+
+    except IndexError:
+        raise ValueError('LZ77 data is truncated')
+
+    return out
+
+
+
+COMPRESSION_FORMATS = {
+    'none'  : None,
+    'rle'   : (compress_rle, decompress_rle),
+    'lz77'  : (compress_lz77, decompress_lz77),
+}
+
+
+
+def compress_data(data, compression):
+    """
+    Compresses `data` with the named format in COMPRESSION_FORMATS.
+
+    The compressed data is decompressed again and compared to `data`, so a compressor bug can
+    never reach the ROM.
+    """
+
+    f = COMPRESSION_FORMATS[compression]
+    if f is None:
+        return data
+
+    compress, decompress = f
+
+    compressed = compress(data)
+
+    if decompress(compressed) != data:
+        raise ValueError(f"{ compression } compression round-trip failed")
+
+    return compressed
+
+
+
+def decompress_data(data, compression):
+    f = COMPRESSION_FORMATS[compression]
+    if f is None:
+        return data
+
+    return f[1](data)
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim: set fenc=utf-8 ai ts=4 sw=4 sts=4 et:
+#
+#
+# SPDX-FileCopyrightText: © 2026 Marcus Rowe <undisbeliever@gmail.com>
+# SPDX-License-Identifier: Zlib
+#
+# Copyright © 2026 Marcus Rowe <undisbeliever@gmail.com>
+#
+# This software is provided 'as-is', without any express or implied warranty.
+# In no event will the authors be held liable for any damages arising from the
+# use of this software.
+#
+# Permission is granted to anyone to use this software for any purpose, including
+# commercial applications, and to alter it and redistribute it freely, subject to
+# the following restrictions:
+#
+#    1. The origin of this software must not be misrepresented; you must not
+#       claim that you wrote the original software. If you use this software in
+#       a product, an acknowledgment in the product documentation would be
+#       appreciated but is not required.
+#
+#    2. Altered source versions must be plainly marked as such, and must not be
+#       misrepresented as being the original software.
+#
+#    3. This notice may not be removed or altered from any source distribution.
+
+
+# png2snes/image2snes conversion jobs, used by `batch-convert.py` and `watch-resources.py`.
+#
+# The manifest is either a JSON file containing a list of jobs (or an object with a `jobs` list)
+# or a JSON Lines file with one job per line.
+#
+# png2snes job:
+#   { "tool": "png2snes", "format": "4bpp", "input": "resources/a-4bpp-tiles.png",
+#     "outputs": { "tiles": "gen/a-4bpp-tiles.tiles", "palette": "gen/a-4bpp-tiles.pal" } }
+#
+# image2snes job:
+#   { "tool": "image2snes", "format": "2bpp", "input": "resources/b.png", "palette": "resources/b-palette.png",
+#     "outputs": { "tiles": "gen/b.2bpp", "tilemap": "gen/b.tilemap", "palette": "gen/b.palette" } }
+#
+# Optional job keys: `max_colors` (png2snes), `high_priority` and `flips` (image2snes),
+# `compress` (both tools, see `_compress.COMPRESSION_FORMATS`).
+#
+# If an image2snes job has no `palette`, the palettes are generated automatically.  The generated
+# palette can be saved as a png image with the optional `palette_image` output.
+#
+# Images that share a palette can be converted into a single tileset with `shared_images`:
+#   "shared_images": [ { "input": "resources/c.png", "tilemap": "gen/c.tilemap" } ]
+
+
+import json
+import time
+
+from png2snes import convert_png_file
+from image2snes import convert_image_file
+from _profile import Profiler
+
+
+
+def read_manifest(filename):
+    with open(filename, 'r') as fp:
+        text = fp.read()
+
+    if filename.endswith('.jsonl'):
+        return [ json.loads(line) for line in text.splitlines() if line.strip() ]
+
+    manifest = json.loads(text)
+    if isinstance(manifest, dict):
+        manifest = manifest['jobs']
+
+    return manifest
+
+
+
+def job_input_files(job):
+    """ Returns the list of files read by a manifest job. """
+
+    shared_images = [ s['input'] for s in job.get('shared_images', ()) ]
+
+    return [ f for f in [ job.get('input'), job.get('palette') ] + shared_images if f ]
+
+
+
+def _run_png2snes(job, cache_dir, profiler):
+    outputs = job['outputs']
+
+    return convert_png_file(job['input'], job['format'], outputs['tiles'], outputs['palette'],
+                            job.get('max_colors', 256), cache_dir, profiler, job.get('compress', 'none'))
+
+
+def _run_image2snes(job, cache_dir, profiler):
+    outputs = job['outputs']
+
+    return convert_image_file(job['input'], job.get('palette'), job['format'],
+                              outputs['tiles'], outputs['tilemap'], outputs['palette'],
+                              job.get('high_priority', False), job.get('flips', 'both'), cache_dir, profiler,
+                              outputs.get('palette_image'),
+                              [ (s['input'], s['tilemap']) for s in job.get('shared_images', ()) ],
+                              job.get('compress', 'none'))
+
+
+TOOLS = {
+    'png2snes'   : _run_png2snes,
+    'image2snes' : _run_image2snes,
+}
+
+
+
+def run_job(job, cache_dir=None):
+    """ Runs a single manifest job.  Returns a result dict (this function does not raise exceptions). """
+
+    result = {
+        'tool': job.get('tool'),
+        'input': job.get('input'),
+        'outputs': job.get('outputs'),
+    }
+
+    profiler = Profiler()
+
+    start_time = time.perf_counter()
+
+    try:
+        tool = TOOLS.get(job.get('tool'))
+        if tool is None:
+            raise ValueError(f"Unknown tool: { job.get('tool') }")
+
+        result['cached'] = tool(job, cache_dir, profiler)
+        result['status'] = 'ok'
+
+    except Exception as e:
+        result['status'] = 'error'
+        result['error'] = f"{ type(e).__name__ }: { e }"
+
+    result['seconds'] = time.perf_counter() - start_time
+    result['stats'] = profiler.to_dict()
+
+    return result
+
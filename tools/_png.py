@@ -0,0 +1,452 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim: set fenc=utf-8 ai ts=4 sw=4 sts=4 et:
+#
+#
+# SPDX-FileCopyrightText: © 2026 Marcus Rowe <undisbeliever@gmail.com>
+# SPDX-License-Identifier: Zlib
+#
+# Copyright © 2026 Marcus Rowe <undisbeliever@gmail.com>
+#
+# This software is provided 'as-is', without any express or implied warranty.
+# In no event will the authors be held liable for any damages arising from the
+# use of this software.
+#
+# Permission is granted to anyone to use this software for any purpose, including
+# commercial applications, and to alter it and redistribute it freely, subject to
+# the following restrictions:
+#
+#    1. The origin of this software must not be misrepresented; you must not
+#       claim that you wrote the original software. If you use this software in
+#       a product, an acknowledgment in the product documentation would be
+#       appreciated but is not required.
+#
+#    2. Altered source versions must be plainly marked as such, and must not be
+#       misrepresented as being the original software.
+#
+#    3. This notice may not be removed or altered from any source distribution.
+
+
+
+
+# A minimal png reader, so the converters can decode small images without importing PIL.
+#
+# Only 8 bit indexed, RGB and RGBA non-interlaced images are decoded.  `open_image()` falls back
+# to PIL for everything else.  Images with many Sub, Average or Paeth filtered rows are unfiltered
+# by PIL if it is installed.
+#
+# The `PngImage` implements the subset of the `PIL.Image.Image` interface used by the
+# converters.  The pixels are decoded when they are first accessed, or one band of rows at a
+# time with `PngImage.bands()`.
+
+
+import struct
+import zlib
+
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# png colour type -> (mode, bytes per pixel)
+COLOR_TYPES = {
+    2 : ('RGB', 3),
+    3 : ('P', 1),
+    6 : ('RGBA', 4),
+}
+
+# Maximum number of Sub, Average or Paeth filtered bytes unfiltered in Python.
+# These filters are unfiltered one byte at a time, larger images are unfiltered by PIL (if it is installed).
+MAX_SLOW_FILTER_BYTES = 64 * 1024
+
+# Maximum number of bytes decompressed at once
+DECOMPRESS_BUFFER_SIZE = 64 * 1024
+
+
+
+class PngPalette:
+    """ The subset of `PIL.ImagePalette.ImagePalette` used by the converters """
+
+    def __init__(self, data):
+        self.mode = 'RGB'
+        self.data = data
+
+
+    def getdata(self):
+        return self.mode, self.data
+
+
+
+class PngImage:
+    """ An image, with the subset of the `PIL.Image.Image` interface used by the converters """
+
+    def __init__(self, mode, width, height, data, palette=None, filename=None):
+        # If `data` is None, the pixels are decoded from `filename` when they are needed
+
+        self.mode = mode
+        self.width = width
+        self.height = height
+        self.palette = palette
+        self.info = dict()
+
+        self.filename = filename
+        self._data = bytes(data) if data is not None else None
+
+
+    @property
+    def size(self):
+        return self.width, self.height
+
+
+    def load(self):
+        if self._data is None:
+            stride = self.width * len(self.mode)
+            raw = bytes().join(self._raw_data())
+
+            if len(raw) < self.height * (stride + 1):
+                raise ValueError(f"{ self.filename }: image data is too short")
+
+            unfilter = _Unfilter(self.mode, self.width)
+            self._data = unfilter.band(raw, self.height)
+
+
+    def getbands(self):
+        return tuple(self.mode)
+
+
+    def tobytes(self):
+        self.load()
+        return self._data
+
+
+    def _raw_data(self):
+        # Yields the decompressed (filtered) image data, a piece at a time
+
+        decompressor = zlib.decompressobj()
+
+        with open(self.filename, 'rb') as fp:
+            fp.seek(len(PNG_SIGNATURE))
+
+            for chunk_type, chunk_data in _read_chunks(fp, self.filename):
+                if chunk_type == b'IEND':
+                    break
+
+                if chunk_type != b'IDAT':
+                    continue
+
+                while chunk_data:
+                    yield decompressor.decompress(chunk_data, DECOMPRESS_BUFFER_SIZE)
+                    chunk_data = decompressor.unconsumed_tail
+
+        yield decompressor.flush()
+
+
+    def bands(self, band_height):
+        """
+        Yields the image as a sequence of `band_height` pixel tall PngImages.
+
+        If the image has not been loaded, only one band is decompressed and unfiltered at a time,
+        so memory is bounded by the size of a band instead of the size of the image.  Each band is
+        unfiltered by PIL if it is installed and the band has more than MAX_SLOW_FILTER_BYTES bytes
+        of Sub, Average or Paeth filtered rows.  Otherwise the band is unfiltered in Python, which
+        is much slower for these filters.
+        """
+
+        if self._data is not None:
+            for y in range(0, self.height, band_height):
+                yield self.crop((0, y, self.width, min(y + band_height, self.height)))
+            return
+
+        row_size = self.width * len(self.mode) + 1
+
+        unfilter = _Unfilter(self.mode, self.width)
+
+        buffer = bytearray()
+        y = 0
+
+        for data in self._raw_data():
+            buffer += data
+
+            while y < self.height:
+                n_rows = min(band_height, self.height - y)
+                if len(buffer) < n_rows * row_size:
+                    break
+
+                band = unfilter.band(buffer, n_rows)
+                del buffer[:n_rows * row_size]
+                y += n_rows
+
+                yield PngImage(self.mode, self.width, n_rows, band, self.palette)
+
+        if y < self.height:
+            raise ValueError(f"{ self.filename }: image data is too short")
+
+
+    def crop(self, box):
+        left, upper, right, lower = box
+
+        if left < 0 or upper < 0 or right > self.width or lower > self.height or left > right or upper > lower:
+            raise ValueError(f"Invalid crop box: { box }")
+
+        data = self.tobytes()
+
+        pixel_size = len(self.mode)
+        stride = self.width * pixel_size
+
+        data = bytes().join(data[y * stride + left * pixel_size : y * stride + right * pixel_size]
+                            for y in range(upper, lower))
+
+        return PngImage(self.mode, right - left, lower - upper, data, self.palette)
+
+
+    def convert(self, mode):
+        if mode == self.mode:
+            return self
+
+        if mode == 'RGB' and self.mode == 'RGBA':
+            data = self.tobytes()
+
+            rgb = bytearray(self.width * self.height * 3)
+            for i in range(3):
+                rgb[i::3] = data[i::4]
+
+            return PngImage('RGB', self.width, self.height, rgb)
+
+        if mode == 'RGB' and self.mode == 'P':
+            # Out of range indexes are black (the same as PIL)
+            pal = self.palette.data.ljust(256 * 3, b'\0')
+            data = self.tobytes()
+
+            rgb = bytearray(self.width * self.height * 3)
+            for i in range(3):
+                rgb[i::3] = data.translate(pal[i::3])
+
+            return PngImage('RGB', self.width, self.height, rgb)
+
+        return self.to_pil().convert(mode)
+
+
+    def to_pil(self):
+        import PIL.Image
+
+        image = PIL.Image.frombytes(self.mode, self.size, self.tobytes())
+        if self.palette is not None:
+            image.putpalette(self.palette.data)
+
+        return image
+
+
+
+def _paeth(a, b, c):
+    p = a + b - c
+    pa = abs(p - a)
+    pb = abs(p - b)
+    pc = abs(p - c)
+
+    if pa <= pb and pa <= pc:
+        return a
+    elif pb <= pc:
+        return b
+    else:
+        return c
+
+
+
+class _Unfilter:
+    """ Unfilters png rows, in order """
+
+    def __init__(self, mode, width):
+        self.mode = mode
+        self.width = width
+        self.pixel_size = len(mode)
+        self.stride = width * self.pixel_size
+
+        self.prior = bytes(self.stride)
+
+        # Up filtered rows are added to the prior row as one big integer, without carries between bytes
+        self.low_bits = int.from_bytes(b'\x7f' * self.stride, 'little')
+        self.high_bits = int.from_bytes(b'\x80' * self.stride, 'little')
+
+
+    def band(self, raw, n_rows):
+        """
+        Unfilters the first `n_rows` rows of `raw` (one filter type byte and `stride` bytes per row).
+
+        The rows are unfiltered by PIL if more than MAX_SLOW_FILTER_BYTES bytes are Sub, Average or
+        Paeth filtered and PIL is installed.
+        """
+
+        stride = self.stride
+        row_size = stride + 1
+
+        filter_types = raw[0 : n_rows * row_size : row_size]
+        if max(filter_types, default=0) > 4:
+            raise ValueError(f"Invalid png filter type: { max(filter_types) }")
+
+        n_slow_bytes = (n_rows - filter_types.count(0) - filter_types.count(2)) * stride
+
+        if n_slow_bytes > MAX_SLOW_FILTER_BYTES:
+            Image = _import_pil()
+            if Image is not None:
+                # The prior row is prepended as an unfiltered row, so the first row is unfiltered correctly
+                data = bytes((0,)) + self.prior + raw[0 : n_rows * row_size]
+                image = Image.frombytes(self.mode, (self.width, n_rows + 1), zlib.compress(data, 0), 'zip', self.mode)
+
+                out = image.tobytes()[stride:]
+                self.prior = out[-stride:]
+
+                return out
+
+        return bytes().join(self(raw[o], raw[o + 1 : o + row_size])
+                            for o in range(0, n_rows * row_size, row_size))
+
+
+    def __call__(self, filter_type, line):
+        stride = self.stride
+        pixel_size = self.pixel_size
+        prior = self.prior
+
+        if filter_type == 0:
+            row = bytes(line)
+
+        elif filter_type == 1:
+            row = bytearray(line)
+            for i in range(pixel_size, stride):
+                row[i] = (row[i] + row[i - pixel_size]) & 0xff
+
+        elif filter_type == 2:
+            a = int.from_bytes(line, 'little')
+            b = int.from_bytes(prior, 'little')
+            row = (((a & self.low_bits) + (b & self.low_bits)) ^ ((a ^ b) & self.high_bits)).to_bytes(stride, 'little')
+
+        elif filter_type == 3:
+            row = bytearray(line)
+            for i in range(stride):
+                left = row[i - pixel_size] if i >= pixel_size else 0
+                row[i] = (row[i] + ((left + prior[i]) >> 1)) & 0xff
+
+        elif filter_type == 4:
+            row = bytearray(line)
+            for i in range(stride):
+                if i >= pixel_size:
+                    p = _paeth(row[i - pixel_size], prior[i], prior[i - pixel_size])
+                else:
+                    p = prior[i]
+                row[i] = (row[i] + p) & 0xff
+
+        else:
+            raise ValueError(f"Invalid png filter type: { filter_type }")
+
+        self.prior = row
+
+        return row
+
+
+
+def _import_pil():
+    # Returns the PIL.Image module, or None if PIL is not installed
+
+    try:
+        import PIL.Image
+    except ImportError:
+        return None
+
+    return PIL.Image
+
+
+
+def _read_chunks(fp, filename):
+    # Yields the (chunk type, chunk data) of each chunk in the file (after the signature)
+
+    while True:
+        header = fp.read(8)
+        if len(header) < 8:
+            return
+
+        length, chunk_type = struct.unpack('>I4s', header)
+        chunk_data = fp.read(length)
+        crc_bytes = fp.read(4)
+
+        if len(chunk_data) != length or len(crc_bytes) != 4:
+            raise ValueError(f"{ filename }: truncated { chunk_type.decode('latin-1') } chunk")
+
+        if zlib.crc32(chunk_type + chunk_data) != int.from_bytes(crc_bytes, 'big'):
+            raise ValueError(f"{ filename }: invalid { chunk_type.decode('latin-1') } chunk CRC")
+
+        yield chunk_type, chunk_data
+
+
+
+def open_png(filename):
+    """
+    Reads the header of a png file, the pixels are decoded when they are needed.
+
+    Returns a PngImage, or None if the built-in reader cannot decode the image.
+    """
+
+    with open(filename, 'rb') as fp:
+        if fp.read(len(PNG_SIGNATURE)) != PNG_SIGNATURE:
+            return None
+
+        header = None
+        palette = None
+
+        for chunk_type, chunk_data in _read_chunks(fp, filename):
+            if chunk_type == b'IHDR':
+                header = struct.unpack('>IIBBBBB', chunk_data)
+            elif chunk_type == b'PLTE':
+                palette = PngPalette(chunk_data)
+            elif chunk_type in (b'IDAT', b'IEND'):
+                break
+
+    if header is None:
+        raise ValueError(f"{ filename }: missing IHDR chunk")
+
+    width, height, bit_depth, color_type, compression, filter_method, interlace = header
+
+    if bit_depth != 8 or color_type not in COLOR_TYPES or interlace != 0:
+        return None
+
+    if compression != 0 or filter_method != 0:
+        raise ValueError(f"{ filename }: unknown png compression or filter method")
+
+    mode, pixel_size = COLOR_TYPES[color_type]
+
+    if mode == 'P' and palette is None:
+        raise ValueError(f"{ filename }: missing PLTE chunk")
+
+    return PngImage(mode, width, height, None, palette if mode == 'P' else None, filename)
+
+
+
+def read_png(filename):
+    """
+    Decodes a png file with the built-in reader.
+
+    Returns a PngImage, or None if the built-in reader cannot decode the image.
+    """
+
+    image = open_png(filename)
+
+    if image is not None:
+        image.load()
+
+    return image
+
+
+
+def open_image(filename):
+    """
+    Opens an image file.
+
+    Returns a PngImage if the built-in reader can decode the file, otherwise a PIL image.
+    The pixels are decoded when they are needed (or by `load()`).
+    """
+
+    image = open_png(filename)
+
+    if image is None:
+        import PIL.Image
+
+        image = PIL.Image.open(filename)
+
+    return image
+
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim: set fenc=utf-8 ai ts=4 sw=4 sts=4 et:
+#
+#
+# SPDX-FileCopyrightText: © 2026 Marcus Rowe <undisbeliever@gmail.com>
+# SPDX-License-Identifier: Zlib
+#
+# Copyright © 2026 Marcus Rowe <undisbeliever@gmail.com>
+#
+# This software is provided 'as-is', without any express or implied warranty.
+# In no event will the authors be held liable for any damages arising from the
+# use of this software.
+#
+# Permission is granted to anyone to use this software for any purpose, including
+# commercial applications, and to alter it and redistribute it freely, subject to
+# the following restrictions:
+#
+#    1. The origin of this software must not be misrepresented; you must not
+#       claim that you wrote the original software. If you use this software in
+#       a product, an acknowledgment in the product documentation would be
+#       appreciated but is not required.
+#
+#    2. Altered source versions must be plainly marked as such, and must not be
+#       misrepresented as being the original software.
+#
+#    3. This notice may not be removed or altered from any source distribution.
+
+
+import contextlib
+import json
+import sys
+import time
+
+
+
+class Profiler:
+    """
+    Records the wall and CPU time of named stages and the values of named counters.
+
+    Profiler statistics from multiple runs (or processes) can be aggregated with `merge()`.
+    """
+
+    def __init__(self):
+        # name -> { 'wall': seconds, 'cpu': seconds, 'calls': int }
+        self.stages = dict()
+        # name -> int
+        self.counters = dict()
+
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+
+        try:
+            yield
+        finally:
+            s = self.stages.setdefault(name, { 'wall': 0.0, 'cpu': 0.0, 'calls': 0 })
+            s['wall'] += time.perf_counter() - wall_start
+            s['cpu'] += time.process_time() - cpu_start
+            s['calls'] += 1
+
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+
+    def to_dict(self):
+        return {
+            'stages': { name: dict(s) for name, s in self.stages.items() },
+            'counters': dict(self.counters),
+        }
+
+
+    def merge(self, stats):
+        """ Adds the statistics of another Profiler (or a `to_dict()` dict) to this profiler. """
+
+        if isinstance(stats, Profiler):
+            stats = stats.to_dict()
+
+        for name, s in stats.get('stages', {}).items():
+            d = self.stages.setdefault(name, { 'wall': 0.0, 'cpu': 0.0, 'calls': 0 })
+            d['wall'] += s['wall']
+            d['cpu'] += s['cpu']
+            d['calls'] += s['calls']
+
+        for name, n in stats.get('counters', {}).items():
+            self.count(name, n)
+
+
+    def report(self, fp=sys.stderr):
+        """ Prints a human readable report. """
+
+        if self.stages:
+            print(f"{ 'stage':16} { 'wall ms':>10} { 'cpu ms':>10} { 'calls':>7}", file=fp)
+
+            for name, s in self.stages.items():
+                print(f"{ name:16} { s['wall'] * 1000:10.3f} { s['cpu'] * 1000:10.3f} { s['calls']:7}", file=fp)
+
+        for name, n in self.counters.items():
+            print(f"{ name + ':':24} { n }", file=fp)
+
+
+    def write_json(self, filename):
+        with open(filename, 'w') as fp:
+            json.dump(self.to_dict(), fp, indent=2)
+            fp.write('\n')
+
@@ -27,8 +27,36 @@
 #    3. This notice may not be removed or altered from any source distribution.
 
 
+import array
 import itertools
-from collections import namedtuple
+import sys
+from collections import namedtuple, Counter
+
+from _profile import Profiler
+
+
+# Increment this value whenever a change to the converters alters their output.
+# (Used to invalidate conversion cache entries.)
+CONVERTER_VERSION = 1
+
+
+# NumPy is only imported when an input is at least this large (importing NumPy takes longer than
+# converting a smaller input in Python).
+NUMPY_MIN_TILES = 1024
+NUMPY_MIN_PIXELS = 512 * 512
+
+
+
+def _import_numpy():
+    # Returns the numpy module, or None if NumPy is not installed
+
+    try:
+        import numpy
+    except ImportError:
+        return None
+
+    return numpy
+
 
 
 TileMapEntry = namedtuple('TileMapEntry', ('tile_id', 'palette_id', 'hflip', 'vflip'))
@@ -53,6 +81,42 @@ def convert_snes_tileset(tiles, bpp):
 
 
 
+def convert_snes_tileset_numpy(tiles, bpp):
+    """ Batched NumPy version of `convert_snes_tileset`.  Output is byte-identical. """
+
+    import numpy
+
+    tile_array = numpy.frombuffer(bytes().join(bytes(t) for t in tiles), dtype=numpy.uint8)
+    tile_array = tile_array.reshape(-1, 8, 8)
+
+    n_tiles = len(tile_array)
+
+    # planes[tile, bit, y] = one bitplane byte (leftmost pixel in the MSB)
+    shifts = numpy.arange(bpp, dtype=numpy.uint8).reshape(1, bpp, 1, 1)
+    planes = numpy.packbits((tile_array[:, numpy.newaxis] >> shifts) & 1, axis=3)
+    planes = planes.reshape(n_tiles, bpp, 8)
+
+    # Bitplanes are stored in pairs, interleaved by row
+    groups = [ planes[:, b:b+2].transpose(0, 2, 1).reshape(n_tiles, 8 * min(2, bpp - b))
+               for b in range(0, bpp, 2) ]
+
+    return bytearray(numpy.concatenate(groups, axis=1).tobytes())
+
+
+
+def convert_snes_tileset_fast(tiles, bpp):
+    """
+    Uses `convert_snes_tileset_numpy` if there are at least NUMPY_MIN_TILES tiles and NumPy is installed,
+    otherwise `convert_snes_tileset`.
+    """
+
+    if len(tiles) >= NUMPY_MIN_TILES and _import_numpy() is not None:
+        return convert_snes_tileset_numpy(tiles, bpp)
+    else:
+        return convert_snes_tileset(tiles, bpp)
+
+
+
 def convert_rgb_color(c):
     r, g, b = c
 
@@ -64,67 +128,235 @@ def convert_rgb_color(c):
 
 
 
-def is_small_tile_not_transparent(image, transparent_color, xpos, ypos):
-    """ Returns True if the tile contains a non-transparent pixel """
+def convert_rgb_array(rgb):
+    """ NumPy version of `convert_rgb_color`.  Converts an (..., 3) uint8 RGB array to a uint16 array. """
 
-    if xpos + 8 > image.width or ypos + 8 > image.height:
-        raise ValueError(f"position out of bounds: { xpos }, { ypos }")
+    import numpy
 
-    return any(convert_rgb_color(image.getpixel((x, y))) != transparent_color
-                 for y in range(ypos, ypos + 8) for x in range(xpos, xpos + 8))
+    rgb = numpy.asarray(rgb, dtype=numpy.uint16) >> 3
 
+    return (rgb[..., 2] << 10) | (rgb[..., 1] << 5) | rgb[..., 0]
 
 
-def extract_tileset_tiles(image):
-    """ Extracts 8x8px tiles from the image. """
+
+def convert_rgb_data(data):
+    """
+    Converts packed 8-bit RGB pixel data to an array('H') of SNES colours.
+
+    Uses NumPy if there are at least NUMPY_MIN_PIXELS pixels and NumPy is installed.
+    """
+
+    numpy = _import_numpy() if len(data) >= NUMPY_MIN_PIXELS * 3 else None
+
+    if numpy is not None:
+        colors = convert_rgb_array(numpy.frombuffer(data, dtype=numpy.uint8).reshape(-1, 3))
+        return array.array('H', colors.tobytes())
+
+    return array.array('H', [ convert_rgb_color(c) for c in zip(data[0::3], data[1::3], data[2::3]) ])
+
+
+
+# Lookup tables that build the low and high bytes of a SNES colour from the RGB channels
+_LOW_RED_LUT    = [ c >> 3 for c in range(256) ]
+_LOW_GREEN_LUT  = [ (c >> 3 & 7) << 5 for c in range(256) ]
+_HIGH_GREEN_LUT = [ c >> 6 for c in range(256) ]
+_HIGH_BLUE_LUT  = [ (c >> 3) << 2 for c in range(256) ]
+
+
+def _convert_rgb_image_lut(image):
+    # PIL version of `convert_rgb_data()`
+
+    from PIL import Image, ImageChops
+
+    r, g, b = image.split()
+
+    low = ImageChops.add(r.point(_LOW_RED_LUT), g.point(_LOW_GREEN_LUT))
+    high = ImageChops.add(g.point(_HIGH_GREEN_LUT), b.point(_HIGH_BLUE_LUT))
+
+    colors = array.array('H', Image.merge('LA', (low, high)).tobytes())
+    if sys.byteorder != 'little':
+        colors.byteswap()
+
+    return colors
+
+
+
+def convert_rgb_image(image):
+    """
+    Converts an image to a plane of SNES colours (an array('H') with one colour per pixel, in row order).
+
+    PIL images are converted with PIL lookup tables, other images with `convert_rgb_data()`.
+    """
 
     if image.mode != 'RGB':
         image = image.convert('RGB')
 
+    if hasattr(image, 'point'):
+        return _convert_rgb_image_lut(image)
+
+    return convert_rgb_data(image.tobytes())
+
+
+
+class ImageBuffer:
+    """
+    An image that has been decoded once into a contiguous buffer.
+
+    Tiles are handed out as zero-copy `memoryview` slices (one slice per tile row),
+    which avoids a Python-level `getpixel()` call for every pixel.
+
+    RGB images are also converted into a plane of SNES colours (see `convert_rgb_image()`).
+    """
+
+    def __init__(self, image, mode=None):
+        if mode and image.mode != mode:
+            image = image.convert(mode)
+
+        self.mode = image.mode
+        self.width = image.width
+        self.height = image.height
+
+        self.pixel_size = len(image.getbands())
+        self.stride = self.width * self.pixel_size
+
+        self.data = memoryview(image.tobytes())
+
+        self.colors = convert_rgb_image(image) if self.mode == 'RGB' else None
+
+
+    @classmethod
+    def from_rgb_data(cls, data, width, height):
+        """ Creates an RGB ImageBuffer from raw pixel data (ie, the output of `tile_bytes()`) """
+
+        buffer = cls.__new__(cls)
+
+        buffer.mode = 'RGB'
+        buffer.width = width
+        buffer.height = height
+
+        buffer.pixel_size = 3
+        buffer.stride = width * 3
+
+        buffer.data = memoryview(data)
+        buffer.colors = convert_rgb_data(data)
+
+        return buffer
+
+
+    def tile_rows(self, xpos, ypos, size):
+        if xpos + size > self.width or ypos + size > self.height:
+            raise ValueError(f"position out of bounds: { xpos }, { ypos }")
+
+        start = ypos * self.stride + xpos * self.pixel_size
+        end = start + size * self.stride
+        row_size = size * self.pixel_size
+
+        return [ self.data[o : o + row_size] for o in range(start, end, self.stride) ]
+
+
+    def tile_bytes(self, xpos, ypos, size):
+        return bytes().join(self.tile_rows(xpos, ypos, size))
+
+
+    def tile_colors(self, xpos, ypos, size):
+        """ Returns the SNES colours of a `size` x `size` tile (requires an RGB buffer) """
+
+        if self.colors is None:
+            raise ValueError('Image is not an RGB image')
+
+        if xpos + size > self.width or ypos + size > self.height:
+            raise ValueError(f"position out of bounds: { xpos }, { ypos }")
+
+        colors = self.colors
+        start = ypos * self.width + xpos
+
+        tile = list()
+        for o in range(start, start + size * self.width, self.width):
+            tile += colors[o : o + size]
+
+        return tile
+
+
+
+def _rgb_image_buffer(image):
+    if isinstance(image, ImageBuffer):
+        return image
+    else:
+        return ImageBuffer(image, 'RGB')
+
+
+
+def _rgb_region_buffer(image, xpos, ypos, size):
+    # Returns a tuple of (buffer, xpos, ypos) for reading a `size` x `size` region of the image.
+    #
+    # Only the region is converted if `image` is not an ImageBuffer.
+
+    if isinstance(image, ImageBuffer):
+        return image, xpos, ypos
+
+    if xpos < 0 or ypos < 0 or xpos + size > image.width or ypos + size > image.height:
+        raise ValueError(f"position out of bounds: { xpos }, { ypos }")
+
+    return ImageBuffer(image.crop((xpos, ypos, xpos + size, ypos + size)), 'RGB'), 0, 0
+
+
+
+def _tile_colors(image, xpos, ypos, size):
+    buffer, xpos, ypos = _rgb_region_buffer(image, xpos, ypos, size)
+
+    return buffer.tile_colors(xpos, ypos, size)
+
+
+
+def is_small_tile_not_transparent(image, transparent_color, xpos, ypos):
+    """ Returns True if the tile contains a non-transparent pixel """
+
+    return any(c != transparent_color for c in _tile_colors(image, xpos, ypos, 8))
+
+
+
+def extract_tileset_tiles(image):
+    """ Extracts 8x8px tiles from the image. """
+
     if image.width % 8 != 0:
         raise ValueError('Image height MUST BE multiple of 8')
 
     if image.height % 8 != 0:
         raise ValueError('Image height MUST BE multiple of 8')
 
+    buffer = _rgb_image_buffer(image)
 
     for ty in range(0, image.height, 8):
         for tx in range(0, image.width, 8):
+            yield buffer.tile_colors(tx, ty, 8)
 
-            tile_data = list()
 
-            for y in range(ty, ty + 8):
-                for x in range(tx, tx + 8):
-                    tile_data.append(convert_rgb_color(image.getpixel((x, y))))
 
-            yield tile_data
+def extract_small_tile(image, xpos, ypos):
+    return _tile_colors(image, xpos, ypos, 8)
 
 
 
-def extract_small_tile(image, xpos, ypos):
-    if xpos + 8 > image.width or ypos + 8 > image.height:
-        raise ValueError(f"position out of bounds: { xpos }, { ypos }")
+def extract_large_tile(image, xpos, ypos):
+    return _tile_colors(image, xpos, ypos, 16)
 
-    return [ convert_rgb_color(image.getpixel((x, y)))
-             for y in range(ypos, ypos + 8) for x in range(xpos, xpos + 8) ]
 
 
+def extract_screen_tiles(image, screen_x, screen_y):
+    """ Extracts the 8x8px tiles of a single 32x32 tile screen, in the same order as a SNES tilemap. """
 
-def extract_large_tile(image, xpos, ypos):
-    if xpos + 16 > image.width or ypos + 16 > image.height:
-        raise ValueError(f"position out of bounds: { xpos }, { ypos }")
+    buffer, xpos, ypos = _rgb_region_buffer(image, screen_x * 256, screen_y * 256, 256)
 
-    return [ convert_rgb_color(image.getpixel((x, y)))
-             for y in range(ypos, ypos + 16) for x in range(xpos, xpos + 16) ]
+    for ty in range(32):
+        ty = ypos + ty * 8
+        for tx in range(32):
+            tx = xpos + tx * 8
 
+            yield buffer.tile_colors(tx, ty, 8)
 
 
-def extract_tilemap_tiles(image):
-    """ Extracts 8x8px tiles from the image, in the same order as a SNES tilemap. """
-
-    if image.mode != 'RGB':
-        image = image.convert('RGB')
 
+def _check_tilemap_image_size(image):
     if image.width % 256 != 0:
         raise ValueError('Image width MUST BE a multiple of 256')
 
@@ -135,25 +367,70 @@ def extract_tilemap_tiles(image):
         raise ValueError('Maximum image size is 512x512 pixels')
 
 
+
+def extract_tilemap_tiles(image):
+    """ Extracts 8x8px tiles from the image, in the same order as a SNES tilemap. """
+
+    _check_tilemap_image_size(image)
+
     t_width = image.width // 8
     t_height = image.height // 8
 
-    img_data = image.getdata()
+    buffer = _rgb_image_buffer(image)
 
     for screen_y in range(t_height // 32):
         for screen_x in range(t_width // 32):
-            for ty in range(32):
-                ty = screen_y * 256 + ty * 8
-                for tx in range(32):
-                    tx = screen_x * 256 + tx * 8
+            yield from extract_screen_tiles(buffer, screen_x, screen_y)
+
+
+
+def extract_tilemap_screens(image):
+    """ Returns the RGB pixel data of each 256x256px screen of the image, in the same order as a SNES tilemap. """
+
+    _check_tilemap_image_size(image)
+
+    buffer = _rgb_image_buffer(image)
+
+    return [ buffer.tile_bytes(screen_x * 256, screen_y * 256, 256)
+             for screen_y in range(image.height // 256) for screen_x in range(image.width // 256) ]
 
-                    tile_data = list()
 
-                    for y in range(ty, ty + 8):
-                        for x in range(tx, tx + 8):
-                            tile_data.append(convert_rgb_color(image.getpixel((x, y))))
 
-                    yield tile_data
+def image_bands(image, band_height=256):
+    """
+    Yields the image as a sequence of `band_height` pixel tall ImageBuffers.
+
+    Only one band is converted into a Python buffer at a time.  If the image has a `bands()`
+    method (an unloaded `_png.PngImage`), only one band is decoded at a time.
+    """
+
+    if image.height % band_height != 0:
+        raise ValueError(f"Image height MUST BE a multiple of { band_height }")
+
+    if hasattr(image, 'bands'):
+        for band in image.bands(band_height):
+            yield ImageBuffer(band, 'RGB')
+    else:
+        for y in range(0, image.height, band_height):
+            yield ImageBuffer(image.crop((0, y, image.width, y + band_height)), 'RGB')
+
+
+
+class PalettesMap(list):
+    """
+    A list of `{ colour: index }` palette dicts.
+
+    `color_masks` maps each colour to a bitmask of the palettes that contain it.
+    """
+
+    def __init__(self, palettes=()):
+        super().__init__(palettes)
+
+        self.color_masks = dict()
+
+        for palette_id, pal_map in enumerate(self):
+            for c in pal_map:
+                self.color_masks[c] = self.color_masks.get(c, 0) | (1 << palette_id)
 
 
 
@@ -173,31 +450,42 @@ def create_palettes_map(image, bpp, pad_palette_data=None):
     if image.width * image.height > max_colors:
         raise ValueError(f"Palette Image has too many colours (max { max_colors })")
 
-    image_data = image.getdata()
+    return create_palettes_map_from_colors(convert_rgb_image(image), bpp)
+
+
 
+def create_palettes_map_from_colors(colors, bpp):
+    # Returns palettes_map
+    #
+    # `colors` is a list of SNES colours, palette 0 first.
+
+    colors_per_palette = 1 << bpp
 
     palettes_map = list()
 
-    for p in range(len(image_data) // colors_per_palette):
+    for p in range(len(colors) // colors_per_palette):
         pal_map = dict()
 
         for x in range(colors_per_palette):
-            c = convert_rgb_color(image_data[p * colors_per_palette + x])
+            c = colors[p * colors_per_palette + x]
             if c not in pal_map:
                 pal_map[c] = x
 
         palettes_map.append(pal_map)
 
-    return palettes_map
+    return PalettesMap(palettes_map)
 
 
 
 def convert_palette_image(image):
-    palette_data = bytearray()
+    return convert_palette_colors(convert_rgb_image(image))
 
-    for c in image.getdata():
-        u16 = convert_rgb_color(c)
 
+
+def convert_palette_colors(colors):
+    palette_data = bytearray()
+
+    for u16 in colors:
         palette_data.append(u16 & 0xff)
         palette_data.append(u16 >> 8)
 
@@ -207,11 +495,137 @@ def convert_palette_image(image):
 
 def get_palette_id(tile, palette_map):
     # Returns a tuple of (palette_id, palette_map)
-    for palette_id, pal_map in enumerate(palette_map):
-        if all([c in pal_map for c in tile]):
-            return palette_id, pal_map
 
-    return None, None
+    color_masks = getattr(palette_map, 'color_masks', None)
+    if color_masks is None:
+        for palette_id, pal_map in enumerate(palette_map):
+            if all(c in pal_map for c in tile):
+                return palette_id, pal_map
+
+        return None, None
+
+
+    mask = (1 << len(palette_map)) - 1
+
+    for c in set(tile):
+        mask &= color_masks.get(c, 0)
+        if not mask:
+            break
+
+    if not mask:
+        return None, None
+
+    # The lowest matching palette wins
+    palette_id = (mask & -mask).bit_length() - 1
+
+    return palette_id, palette_map[palette_id]
+
+
+
+# Automatic palettes
+
+MAX_AUTO_PALETTES = 8
+
+
+def create_auto_palette(tiles, bpp, max_palettes=MAX_AUTO_PALETTES):
+    """
+    Creates palettes for `tiles` (an iterable of SNES colour tiles) when there is no palette image.
+
+    The per-tile colour sets are packed into at most `max_palettes` palettes, largest set first,
+    into the palette that needs the fewest new colours.  Colour 0 of every palette is the most
+    common colour (so it can be transparent).  Tiles that do not fit in a palette will need their
+    colours merged by `fit_tile_palette()`.
+
+    Returns a list of SNES colours (palette 0 first), padded to a multiple of 16 colours.
+    """
+
+    colors_per_palette = 1 << bpp
+    max_palettes = max(1, min(max_palettes, 256 // colors_per_palette))
+    capacity = colors_per_palette - 1
+
+    color_counts = Counter()
+    color_sets = set()
+
+    for tile in tiles:
+        color_counts.update(tile)
+        color_sets.add(frozenset(tile))
+
+    if color_counts:
+        bg_color = min(color_counts, key=lambda c: (-color_counts[c], c))
+    else:
+        bg_color = 0
+
+    def most_common(colors, n):
+        return sorted(colors, key=lambda c: (-color_counts[c], c))[:n]
+
+
+    palettes = list()
+
+    for cset in sorted((s - { bg_color } for s in color_sets), key=lambda s: (-len(s), sorted(s))):
+        best = None
+        best_new = None
+
+        for i, p in enumerate(palettes):
+            n_new = len(cset - p)
+            if len(p) + n_new <= capacity and (best is None or n_new < best_new):
+                best = i
+                best_new = n_new
+
+        if best is not None:
+            palettes[best] |= cset
+
+        elif len(palettes) < max_palettes:
+            palettes.append(set(most_common(cset, capacity)))
+
+        else:
+            # No room: fill the free slots of the palette with the most shared colours
+            i = max(range(len(palettes)), key=lambda i: (len(cset & palettes[i]), -i))
+            p = palettes[i]
+            p.update(most_common(cset - p, capacity - len(p)))
+
+    if not palettes:
+        palettes.append(set())
+
+    colors = list()
+    for p in palettes:
+        pal = [ bg_color ] + sorted(p)
+        colors += pal + [ bg_color ] * (colors_per_palette - len(pal))
+
+    colors += [ bg_color ] * (-len(colors) % 16)
+
+    return colors
+
+
+
+def _color_distance(a, b):
+    dr = (a & 31) - (b & 31)
+    dg = ((a >> 5) & 31) - ((b >> 5) & 31)
+    db = ((a >> 10) & 31) - ((b >> 10) & 31)
+
+    return dr * dr + dg * dg + db * db
+
+
+
+def fit_tile_palette(tile, palettes_map):
+    """
+    Merges the colours of a tile that does not match any palette.
+
+    The palette containing the most tile pixels is used and the missing colours are replaced by
+    the nearest colour in that palette.
+
+    Returns a tuple of (palette_id, palette_map, tile)
+    """
+
+    counts = Counter(tile)
+
+    palette_id = max(range(len(palettes_map)),
+                     key=lambda i: (sum(n for c, n in counts.items() if c in palettes_map[i]), -i))
+    pal_map = palettes_map[palette_id]
+
+    replace = { c: min(pal_map, key=lambda p: (_color_distance(c, p), pal_map[p]))
+                for c in counts if c not in pal_map }
+
+    return palette_id, pal_map, [ replace.get(c, c) for c in tile ]
 
 
 
@@ -245,55 +659,383 @@ def split_large_tile(tile):
 
 
 
-def convert_tilemap_and_tileset(tiles, palettes_map):
-    # Returns a tuple(tilemap, tileset)
+FLIP_NONE = 0
+FLIP_H = 1
+FLIP_V = 2
+FLIP_BOTH = FLIP_H | FLIP_V
 
-    invalid_tiles = list()
+FLIP_MODES = {
+    'none'  : FLIP_NONE,
+    'h'     : FLIP_H,
+    'v'     : FLIP_V,
+    'both'  : FLIP_BOTH,
+}
 
-    tilemap = list()
-    tileset = list()
 
-    tileset_map = dict()
+DedupStats = namedtuple('DedupStats', ('tiles', 'unique_tiles', 'exact_matches', 'flip_matches', 'bytes_saved'))
 
-    for tile_index, tile in enumerate(tiles):
-        palette_id, pal_map = get_palette_id(tile, palettes_map)
 
-        if pal_map:
-            # Must be bytes() here as a dict() key must be immutable
-            tile_data = bytes([pal_map[c] for c in tile])
 
-            tile_match = tileset_map.get(tile_data, None)
-            if tile_match is None:
-                tile_id = len(tileset)
-                tile_match = tile_id, False, False
+class TileDeduplicator:
+    """
+    Deduplicates square tiles of palette indexes, matching flipped tiles if `flip_mode` allows it.
+
+    Each unique tile is indexed once, by the hash of its canonical (smallest) orientation.
+    """
+
+    def __init__(self, flip_mode=FLIP_BOTH, tile_size=8, bpp=8):
+        if flip_mode & ~FLIP_BOTH:
+            raise ValueError(f"Invalid flip mode: { flip_mode }")
+
+        self.flip_mode = flip_mode
+        self.tile_size = tile_size
+        self.bpp = bpp
+
+        # The flips to search, in match priority order
+        self._flips = [ f for f in (FLIP_NONE, FLIP_H, FLIP_V, FLIP_BOTH) if f & ~flip_mode == 0 ]
+
+        self.tiles = list()
+
+        # hash(canonical tile) -> tile_id
+        self._index = dict()
+        # canonical tile -> tile_id (only used on hash collisions)
+        self._overflow = dict()
+
+        self.n_tiles = 0
+        self.exact_matches = 0
+        self.flip_matches = 0
+
+
+    def _orientations(self, tile_data):
+        # Returns the tile orientations, indexed by flip
+
+        if self.flip_mode == FLIP_NONE:
+            return [ tile_data ]
+
+        size = self.tile_size
+        h_tile_data = bytes().join(tile_data[i + size - 1 : i - 1 if i else None : -1]
+                                   for i in range(0, len(tile_data), size))
+
+        # A vertical flip is a horizontal flip in reverse order and a h+v flip is the tile in reverse order
+        return [ tile_data, h_tile_data, h_tile_data[::-1], tile_data[::-1] ]
+
+
+    def _match(self, tile_id, orientations):
+        # Returns the flip that transforms tile `tile_id` into the tile with the given `orientations` (or None)
+
+        stored = self.tiles[tile_id]
+
+        for f in self._flips:
+            if orientations[f] == stored:
+                return f
+
+        return None
+
+
+    def _insert(self, tile_data):
+        # Returns a tuple of (tile_id, flip).  `flip` is None if the tile was added to the tileset.
+
+        orientations = self._orientations(tile_data)
+        canonical = min(orientations[f] for f in self._flips)
+        key = hash(canonical)
+
+        tile_id = self._index.get(key)
+        flip = None
+
+        if tile_id is not None:
+            flip = self._match(tile_id, orientations)
+
+            if flip is None:
+                tile_id = self._overflow.get(canonical)
+                if tile_id is not None:
+                    flip = self._match(tile_id, orientations)
+
+        if flip is None:
+            tile_id = len(self.tiles)
+
+            self.tiles.append(tile_data)
+
+            if key not in self._index:
+                self._index[key] = tile_id
+            else:
+                self._overflow[canonical] = tile_id
+
+        return tile_id, flip
+
+
+    def add(self, tile_data):
+        """
+        Adds a tile to the tileset if it (or an allowed flip of it) is not already present.
+
+        Returns a tuple of (tile_id, hflip, vflip).
+        """
+
+        tile_data = bytes(tile_data)
+
+        if len(tile_data) != self.tile_size * self.tile_size:
+            raise ValueError('Invalid tile size')
+
+        self.n_tiles += 1
+
+        tile_id, flip = self._insert(tile_data)
+
+        if flip is None:
+            flip = FLIP_NONE
+        elif flip == FLIP_NONE:
+            self.exact_matches += 1
+        else:
+            self.flip_matches += 1
+
+        return tile_id, bool(flip & FLIP_H), bool(flip & FLIP_V)
+
+
+    def merge(self, tiles, tilemap):
+        """
+        Merges the tileset and Tilemap of another TileDeduplicator (with the same flip mode) into this one.
+
+        Returns `tilemap` with its tile ids and flips remapped to this tileset.  The tileset, tilemap
+        and counters are the same as if the original tiles had been passed to `add()` in tilemap order.
+        """
+
+        n_tiles_before = len(self.tiles)
+
+        remap = list()
+
+        for tile_data in tiles:
+            tile_id, flip = self._insert(tile_data)
+            remap.append((tile_id, flip or FLIP_NONE))
+
+        words = array.array('H')
+        n_flipped = 0
+
+        for w in tilemap.words:
+            tile_id, flip = remap[w & 0x3ff]
+
+            # The flips compose with xor.  A symmetric tile matches more than one flip and both
+            # deduplicators returned the lowest matching flip, so their xor is also the lowest.
+            flip ^= w >> 14
+
+            if flip != FLIP_NONE:
+                n_flipped += 1
+
+            words.append((tile_id & 0x3ff) | (w & 0x1c00) | (flip << 14))
+
+        n_new_tiles = len(self.tiles) - n_tiles_before
+
+        self.n_tiles += len(words)
+        self.flip_matches += n_flipped
+        self.exact_matches += len(words) - n_new_tiles - n_flipped
+
+        return Tilemap(words)
+
+
+    def stats(self):
+        n_duplicates = self.exact_matches + self.flip_matches
+
+        return DedupStats(
+            tiles=self.n_tiles,
+            unique_tiles=len(self.tiles),
+            exact_matches=self.exact_matches,
+            flip_matches=self.flip_matches,
+            bytes_saved=n_duplicates * self.tile_size * self.tile_size * self.bpp // 8,
+        )
+
 
-                tileset.append(tile_data)
 
-                h_tile_data = hflip_tile(tile_data)
-                v_tile_data = vflip_tile(tile_data)
-                hv_tile_data = vflip_tile(h_tile_data)
+def match_tile_palettes(tiles, palettes_map, merged_tiles=None):
+    # Returns a list of (palette_id, palette-indexed tile data) tuples
+    #
+    # If `merged_tiles` is a list, tiles that do not match a palette have their colours merged
+    # (see `fit_tile_palette()`) and their indexes are appended to `merged_tiles`.
 
-                tileset_map[tile_data] = tile_match
-                tileset_map.setdefault(h_tile_data, (tile_id, True, False))
-                tileset_map.setdefault(v_tile_data, (tile_id, False, True))
-                tileset_map.setdefault(hv_tile_data, (tile_id, True, True))
+    invalid_tiles = list()
+
+    out = list()
+
+    for tile_index, tile in enumerate(tiles):
+        palette_id, pal_map = get_palette_id(tile, palettes_map)
 
-            tilemap.append(TileMapEntry(tile_id=tile_match[0], palette_id=palette_id, hflip=tile_match[1], vflip=tile_match[2]))
+        if pal_map:
+            out.append((palette_id, [pal_map[c] for c in tile]))
+        elif merged_tiles is not None:
+            palette_id, pal_map, tile = fit_tile_palette(tile, palettes_map)
+            out.append((palette_id, [pal_map[c] for c in tile]))
+            merged_tiles.append(tile_index)
         else:
             invalid_tiles.append(tile_index)
 
     if invalid_tiles:
         raise ValueError(f"Cannot find palette for tiles {invalid_tiles}")
 
-    return tilemap, tileset
+    return out
+
+
+
+class Tilemap:
+    """
+    A compact tilemap, stored as an array of SNES tilemap words (without the order bit).
+
+    Indexing or iterating a Tilemap returns TileMapEntry tuples.  Slicing returns a Tilemap.
+    """
+
+    # Lookup table that sets the order bit in a tilemap high byte
+    _ORDER_TABLE = bytes(b | 0x20 for b in range(256))
+
+
+    def __init__(self, words=()):
+        self.words = array.array('H', words)
+
+
+    @classmethod
+    def from_entries(cls, entries):
+        tilemap = cls()
+        for t in entries:
+            tilemap.append(t.tile_id, t.palette_id, t.hflip, t.vflip)
+        return tilemap
+
+
+    def append(self, tile_id, palette_id, hflip, vflip):
+        self.words.append((tile_id & 0x3ff) | ((palette_id & 7) << 10) | (bool(hflip) << 14) | (bool(vflip) << 15))
+
+
+    def extend(self, tilemap):
+        self.words.extend(tilemap.words)
+
+
+    @staticmethod
+    def _entry(w):
+        return TileMapEntry(tile_id=w & 0x3ff, palette_id=(w >> 10) & 7, hflip=bool(w & 0x4000), vflip=bool(w & 0x8000))
+
+
+    def __len__(self):
+        return len(self.words)
+
+
+    def __eq__(self, other):
+        return isinstance(other, Tilemap) and self.words == other.words
+
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return Tilemap(self.words[i])
+        return self._entry(self.words[i])
+
+
+    def __iter__(self):
+        return map(self._entry, self.words)
+
+
+    def entries(self):
+        return list(self)
+
+
+    @property
+    def n_screens(self):
+        return len(self.words) // (32 * 32)
+
+
+    def screen(self, i):
+        # Returns the tilemap of the i-th 32x32 screen (in SNES order)
+        return self[i * 32 * 32 : (i + 1) * 32 * 32]
+
+
+    def _le_bytes(self):
+        words = self.words
+        if sys.byteorder != 'little':
+            words = array.array('H', words)
+            words.byteswap()
+        return words.tobytes()
+
+
+    def data(self, default_order):
+        data = bytearray(self._le_bytes())
+        if default_order:
+            data[1::2] = data[1::2].translate(self._ORDER_TABLE)
+        return data
+
+
+    def low_data(self):
+        return bytearray(self._le_bytes()[0::2])
+
+
+    def high_data(self, default_order):
+        data = bytearray(self._le_bytes()[1::2])
+        if default_order:
+            data = data.translate(self._ORDER_TABLE)
+        return data
+
+
+
+def deduplicate_tiles(indexed_tiles, dedup):
+    # Returns a Tilemap (the tileset is stored in `dedup.tiles`)
+    #
+    # `indexed_tiles` is a list of (palette_id, palette-indexed tile data) tuples
+
+    tilemap = Tilemap()
+
+    for palette_id, tile_data in indexed_tiles:
+        tile_id, hflip, vflip = dedup.add(tile_data)
+
+        tilemap.append(tile_id, palette_id, hflip, vflip)
+
+    return tilemap
+
+
+
+def convert_tilemap_and_tileset(tiles, palettes_map, dedup=None, merged_tiles=None):
+    # Returns a tuple(tilemap, tileset)
+    #
+    # If `dedup` is a TileDeduplicator, its tileset is used (and extended).
+    # See `match_tile_palettes()` for `merged_tiles`.
+
+    if dedup is None:
+        dedup = TileDeduplicator()
+
+    tilemap = deduplicate_tiles(match_tile_palettes(tiles, palettes_map, merged_tiles), dedup)
+
+    return tilemap, dedup.tiles
+
+
+
+def convert_tilemaps_and_tileset(tile_groups, palettes_map, dedup=None, merged_tiles=None):
+    # Returns a tuple(tilemaps, tileset)
+    #
+    # Converts a group of images (`tile_groups` is a list of tile lists) into one tilemap per image
+    # and a single tileset that is shared by all of the tilemaps.
+    #
+    # If `merged_tiles` is a list, the colour-merged tiles are indexed by their position in the
+    # group's tilemaps (the same as `images_to_snes()`).
+
+    if dedup is None:
+        dedup = TileDeduplicator()
+
+    tilemaps = list()
+    first_tile = 0
+
+    for tiles in tile_groups:
+        group_merged = list() if merged_tiles is not None else None
+
+        tilemap, tileset = convert_tilemap_and_tileset(tiles, palettes_map, dedup, group_merged)
+        tilemaps.append(tilemap)
+
+        if group_merged:
+            merged_tiles.extend(first_tile + i for i in group_merged)
+        first_tile += len(tilemap)
+
+    return tilemaps, dedup.tiles
 
 
 
 def create_tilemap_data(tilemap, default_order):
-    data = bytearray()
+    # `tilemap` is a Tilemap or a list of TileMapEntry tuples
 
     assert(len(tilemap) % 32 * 32 == 0)
 
+    if isinstance(tilemap, Tilemap):
+        return tilemap.data(default_order)
+
+    data = bytearray()
+
     for t in tilemap:
         data.append(t.tile_id & 0xff)
         data.append(((t.tile_id & 0x3ff) >> 8) | ((t.palette_id & 7) << 2)
@@ -304,10 +1046,15 @@ def create_tilemap_data(tilemap, default_order):
 
 
 def create_tilemap_data_low(tilemap):
-    data = bytearray()
+    # `tilemap` is a Tilemap or a list of TileMapEntry tuples
 
     assert(len(tilemap) % 32 * 32 == 0)
 
+    if isinstance(tilemap, Tilemap):
+        return tilemap.low_data()
+
+    data = bytearray()
+
     for t in tilemap:
         data.append(t.tile_id & 0xff)
 
@@ -316,10 +1063,15 @@ def create_tilemap_data_low(tilemap):
 
 
 def create_tilemap_data_high(tilemap, default_order):
-    data = bytearray()
+    # `tilemap` is a Tilemap or a list of TileMapEntry tuples
 
     assert(len(tilemap) % 32 * 32 == 0)
 
+    if isinstance(tilemap, Tilemap):
+        return tilemap.high_data(default_order)
+
+    data = bytearray()
+
     for t in tilemap:
         data.append(((t.tile_id & 0x3ff) >> 8) | ((t.palette_id & 7) << 2)
                     | (bool(default_order) << 5) | (bool(t.hflip) << 6) | (bool(t.vflip) << 7))
@@ -328,19 +1080,560 @@ def create_tilemap_data_high(tilemap, default_order):
 
 
 
-def image_to_snes(image, palette_image, bpp):
+def _convert_screen(screen_data, palettes_map, flip_mode, merge_colors):
+    # Worker process function for `convert_screens_parallel()`.
+    #
+    # Returns a tuple of (tilemap, tileset, merged_tiles) for a single screen.
+
+    dedup = TileDeduplicator(flip_mode)
+    merged_tiles = list() if merge_colors else None
+
+    tiles = extract_screen_tiles(ImageBuffer.from_rgb_data(screen_data, 256, 256), 0, 0)
+    tilemap, tileset = convert_tilemap_and_tileset(tiles, palettes_map, dedup, merged_tiles)
+
+    return tilemap, tileset, merged_tiles
+
+
+
+def convert_screens_parallel(screens, palettes_map, dedup, executor, merge_colors=False):
+    """
+    Converts 256x256px screens in the worker processes of `executor`.
+
+    `screens` is a list of RGB pixel data (see `extract_tilemap_screens()`).
+
+    The palette matching and tile deduplication of each screen is done in a worker process.  The
+    screen tilesets are then merged into `dedup` in screen order, so the output is the same as
+    `convert_tilemap_and_tileset()`.
+
+    Yields a tuple of (tilemap, merged_tiles) for each screen.  If `merge_colors` is False,
+    `merged_tiles` is None, otherwise it is a list of the screen's colour-merged tile indexes.
+    """
+
+    n_screens = len(screens)
+
+    results = executor.map(_convert_screen, screens, [ palettes_map ] * n_screens,
+                           [ dedup.flip_mode ] * n_screens, [ merge_colors ] * n_screens)
+
+    for tilemap, tileset, merged_tiles in results:
+        yield dedup.merge(tileset, tilemap), merged_tiles
+
+
+
+MAX_TILEMAP_TILES = 1024
+
+
+def stream_tilemaps(bands, palettes_map, dedup, merged_tiles=None, executor=None):
+    """
+    Converts a large image, one 256px tall band at a time, into tilemaps.
+
+    `bands` is an iterable of 256px tall ImageBuffers (see `image_bands()`).
+
+    Yields the Tilemap of each 32x32 screen, in SNES order (left to right, then top to bottom).
+    The tiles are deduplicated into `dedup.tiles`.
+
+    If `merged_tiles` is a list, the tilemap indexes of the colour-merged tiles are appended to it.
+
+    If `executor` is not None, the screens of each band are converted in its worker processes
+    (see `convert_screens_parallel()`).
+    """
+
+    screen_index = 0
+
+    for screen_y, band in enumerate(bands):
+        if band.width % 256 != 0:
+            raise ValueError('Image width MUST BE a multiple of 256')
+
+        if band.height != 256:
+            raise ValueError('Band height MUST BE 256')
+
+        if executor is not None:
+            screens = [ band.tile_bytes(screen_x * 256, 0, 256) for screen_x in range(band.width // 256) ]
+            results = convert_screens_parallel(screens, palettes_map, dedup, executor, merged_tiles is not None)
+
+        for screen_x in range(band.width // 256):
+            screen_merged = list() if merged_tiles is not None else None
+
+            try:
+                if executor is not None:
+                    tilemap, screen_merged = next(results)
+                else:
+                    tilemap, tileset = convert_tilemap_and_tileset(
+                                            extract_screen_tiles(band, screen_x, 0), palettes_map, dedup, screen_merged)
+            except ValueError as e:
+                raise ValueError(f"screen { screen_x }, { screen_y }: { e }")
+
+            if screen_merged:
+                merged_tiles.extend(screen_index * 32 * 32 + i for i in screen_merged)
+            screen_index += 1
+
+            if len(dedup.tiles) > MAX_TILEMAP_TILES:
+                raise ValueError(f"Too many tiles (max { MAX_TILEMAP_TILES })")
+
+            yield tilemap
+
+
+
+def stream_tilemap_data(bands, palettes_map, default_order, dedup, merged_tiles=None, executor=None):
+    """ Yields the tilemap data of each 32x32 screen of a large image (see `stream_tilemaps()`). """
+
+    for tilemap in stream_tilemaps(bands, palettes_map, dedup, merged_tiles, executor):
+        yield create_tilemap_data(tilemap, default_order)
+
+
+
+def _image_band_tiles(image):
+    # Yields the tiles of a large image in SNES order, decoding one band at a time
+
+    for band in image_bands(image):
+        for screen_x in range(band.width // 256):
+            yield from extract_screen_tiles(band, screen_x, 0)
+
+
+
+def _stream_images(images, palettes_map, dedup, executor, merged_tiles):
+    # Returns a list of tilemaps, one for each image
+    #
+    # Each image is decoded and converted one band at a time (see `stream_tilemaps()`).
+    # The `merged_tiles` indexes are offset by the image's position in the group.
+
+    tilemaps = list()
+    first_tile = 0
+
+    for image in images:
+        image_merged = list() if merged_tiles is not None else None
+
+        tilemap = Tilemap()
+        for screen_tilemap in stream_tilemaps(image_bands(image), palettes_map, dedup, image_merged, executor):
+            tilemap.extend(screen_tilemap)
+
+        if image_merged:
+            merged_tiles.extend(first_tile + i for i in image_merged)
+        first_tile += len(tilemap)
+
+        tilemaps.append(tilemap)
+
+    return tilemaps
+
+
+
+def _convert_images_parallel(images, palettes_map, dedup, executor, merged_tiles):
+    # Returns a list of tilemaps, one for each image
+    #
+    # The `merged_tiles` indexes are offset by the image's position in the group (the same as
+    # `images_to_snes()`).
+
+    screen_groups = [ extract_tilemap_screens(image) for image in images ]
+
+    results = convert_screens_parallel(list(itertools.chain.from_iterable(screen_groups)),
+                                       palettes_map, dedup, executor, merged_tiles is not None)
+
+    tilemaps = list()
+    first_screen = 0
+
+    for screens in screen_groups:
+        tilemap = Tilemap()
+
+        for screen_index in range(len(screens)):
+            try:
+                screen_tilemap, screen_merged = next(results)
+            except ValueError as e:
+                raise ValueError(f"screen { screen_index }: { e }")
+
+            tilemap.extend(screen_tilemap)
+
+            if screen_merged:
+                merged_tiles.extend((first_screen + screen_index) * 32 * 32 + i for i in screen_merged)
+
+        tilemaps.append(tilemap)
+        first_screen += len(screens)
+
+    return tilemaps
+
+
+
+def image_to_snes(image, palette_image, bpp, flip_mode=FLIP_BOTH, dedup=None, profiler=None, executor=None):
     # Return (tilemap, tile_data, palette_data)
+    #
+    # If `palette_image` is None, the palettes are created by `create_auto_palette()`.
+    #
+    # If `profiler` is not None, the time of each stage and the tile counters are recorded.
+
+    tilemaps, tile_data, palette_data = images_to_snes([ image ], palette_image, bpp, flip_mode, dedup, profiler,
+                                                          executor)
+
+    return tilemaps[0], tile_data, palette_data
+
+
+
+def images_to_snes(images, palette_image, bpp, flip_mode=FLIP_BOTH, dedup=None, profiler=None, executor=None):
+    # Return (tilemaps, tile_data, palette_data)
+    #
+    # Converts a group of images (ie, multiple backgrounds or animation frames) that share a palette
+    # into one tilemap per image and a single deduplicated tileset.
+    #
+    # If `palette_image` is None, the palettes are created by `create_auto_palette()`.  The
+    # colour-merged tiles are indexed by their position in the group's tilemaps (in image order).
+    #
+    # If `profiler` is not None, the time of each stage and the tile counters are recorded.
+    #
+    # If `executor` is not None, the screens are converted in its worker processes
+    # (see `convert_screens_parallel()`).
+    #
+    # If an image is larger than 512x512 pixels, the images are decoded and converted one 256px tall
+    # band at a time (see `stream_tilemaps()`).  With automatic palettes, the bands are decoded twice.
+
+    if dedup is None:
+        dedup = TileDeduplicator(flip_mode, bpp=bpp)
+
+    if profiler is None:
+        profiler = Profiler()
+
+    streaming = any(image.width > 512 or image.height > 512 for image in images)
+
+    if not streaming:
+        with profiler.stage('decode'):
+            for image in images:
+                image.load()
+
+    if not streaming and (executor is None or palette_image is None):
+        with profiler.stage('extract'):
+            tile_groups = [ list(extract_tilemap_tiles(image)) for image in images ]
+
+    merged_tiles = None
+
+    if palette_image is not None:
+        with profiler.stage('palettes_map'):
+            palettes_map = create_palettes_map(palette_image, bpp)
+    else:
+        with profiler.stage('auto_palette'):
+            if streaming:
+                all_tiles = itertools.chain.from_iterable(_image_band_tiles(image) for image in images)
+            else:
+                all_tiles = itertools.chain.from_iterable(tile_groups)
+
+            palette_colors = create_auto_palette(all_tiles, bpp)
+            palettes_map = create_palettes_map_from_colors(palette_colors, bpp)
+            merged_tiles = list()
+
+    if streaming:
+        with profiler.stage('stream_tilemap'):
+            tilemaps = _stream_images(images, palettes_map, dedup, executor, merged_tiles)
+    elif executor is None:
+        with profiler.stage('match_palettes'):
+            indexed_groups = list()
+            first_tile = 0
+
+            for tiles in tile_groups:
+                group_merged = list() if merged_tiles is not None else None
+
+                indexed_groups.append(match_tile_palettes(tiles, palettes_map, group_merged))
+
+                if group_merged:
+                    merged_tiles.extend(first_tile + i for i in group_merged)
+                first_tile += len(tiles)
+
+        with profiler.stage('dedup'):
+            tilemaps = [ deduplicate_tiles(indexed_tiles, dedup) for indexed_tiles in indexed_groups ]
+    else:
+        with profiler.stage('parallel_convert'):
+            tilemaps = _convert_images_parallel(images, palettes_map, dedup, executor, merged_tiles)
+
+    if len(dedup.tiles) > MAX_TILEMAP_TILES:
+        raise ValueError(f"Too many tiles (max { MAX_TILEMAP_TILES })")
+
+    with profiler.stage('encode'):
+        tile_data = convert_snes_tileset_fast(dedup.tiles, bpp)
+
+    with profiler.stage('palette'):
+        if palette_image is not None:
+            palette_data = convert_palette_image(palette_image)
+        else:
+            palette_data = convert_palette_colors(palette_colors)
+
+    count_dedup_stats(profiler, dedup)
+
+    if merged_tiles is not None:
+        profiler.count('merged_tiles', len(merged_tiles))
+
+    return tilemaps, tile_data, palette_data
+
+
+
+def count_dedup_stats(profiler, dedup):
+    stats = dedup.stats()
+
+    profiler.count('tiles', stats.tiles)
+    profiler.count('unique_tiles', stats.unique_tiles)
+    profiler.count('exact_matches', stats.exact_matches)
+    profiler.count('flip_matches', stats.flip_matches)
+
+
+
+# Mode 7
+# ======
+#
+# A mode 7 map is a 128x128 byte tilemap and up to 256 8bpp tiles (64 bytes of palette indexes per
+# tile, no flips), sharing one 256 colour palette.  In VRAM the tilemap is stored in the low bytes
+# and the tiles in the high bytes.
+
+MODE7_MAP_SIZE = 128
+MODE7_MAX_TILES = 256
+MODE7_VRAM_SIZE = MODE7_MAP_SIZE * MODE7_MAP_SIZE
+
+
+def _mode7_map_tiles_numpy(image):
+    # Returns a (16384, 64) uint8 array of the tiles in tilemap order
+
+    import numpy
+
+    size = MODE7_MAP_SIZE * 8
+
+    pixels = numpy.zeros((size, size), dtype=numpy.uint8)
+    pixels[0:image.height, 0:image.width] = numpy.asarray(image, dtype=numpy.uint8)
+
+    return pixels.reshape(MODE7_MAP_SIZE, 8, MODE7_MAP_SIZE, 8).transpose(0, 2, 1, 3).reshape(-1, 64)
+
+
+
+def _convert_mode7_map_numpy(image):
+    import numpy
+
+    tiles = _mode7_map_tiles_numpy(image)
+
+    # Each tile is compared as a single 64 byte value
+    keys = numpy.ascontiguousarray(tiles).view(numpy.dtype((numpy.void, 64))).ravel()
+    unique, first, inverse = numpy.unique(keys, return_index=True, return_inverse=True)
+
+    # Number the unique tiles in the order they first appear in the map
+    order = numpy.argsort(first, kind='stable')
+    tile_ids = numpy.empty(len(order), dtype=numpy.intp)
+    tile_ids[order] = numpy.arange(len(order))
+
+    tilemap = tile_ids[inverse.ravel()]
+
+    return tilemap.tolist(), [ tiles[i].tobytes() for i in first[order] ]
+
+
+
+def _convert_mode7_map_python(image):
+    buffer = ImageBuffer(image)
+    blank = bytes(64)
+
+    tile_ids = dict()
+    tilemap = list()
+
+    for ty in range(0, MODE7_MAP_SIZE * 8, 8):
+        for tx in range(0, MODE7_MAP_SIZE * 8, 8):
+            if tx < image.width and ty < image.height:
+                tile = bytes(buffer.tile_bytes(tx, ty, 8))
+            else:
+                tile = blank
+
+            tilemap.append(tile_ids.setdefault(tile, len(tile_ids)))
+
+    return tilemap, list(tile_ids)
+
+
+
+def convert_mode7_map(image):
+    """
+    Converts an indexed image (up to 1024x1024 px) into a mode 7 tilemap and a deduplicated tileset.
+
+    Images smaller than 1024x1024 px are padded with colour 0.
+    The tiles are numbered in the order they first appear in the map.
+
+    Returns a tuple of (tilemap_data, tileset_data), 16384 bytes and 64 bytes per tile.
+    """
+
+    if image.mode != 'P':
+        raise ValueError('Image must be indexed')
+
+    if image.width % 8 != 0 or image.height % 8 != 0:
+        raise ValueError('Image size MUST BE a multiple of 8')
+
+    if image.width > MODE7_MAP_SIZE * 8 or image.height > MODE7_MAP_SIZE * 8:
+        raise ValueError(f"Image is too large (max { MODE7_MAP_SIZE * 8 }x{ MODE7_MAP_SIZE * 8 })")
+
+    if image.width * image.height >= NUMPY_MIN_PIXELS and _import_numpy() is not None:
+        tilemap, tiles = _convert_mode7_map_numpy(image)
+    else:
+        tilemap, tiles = _convert_mode7_map_python(image)
+
+    if len(tiles) > MODE7_MAX_TILES:
+        raise ValueError(f"Too many tiles ({ len(tiles) }, max { MODE7_MAX_TILES })")
+
+    return bytes(tilemap), bytes().join(tiles)
+
+
+
+def interleave_mode7_data(tilemap_data, tileset_data):
+    """ Returns the 32 KiB of mode 7 VRAM data (tilemap in the low bytes, tiles in the high bytes). """
+
+    out = bytearray(MODE7_VRAM_SIZE * 2)
+
+    out[0:len(tilemap_data) * 2:2] = tilemap_data
+    out[1:len(tileset_data) * 2:2] = tileset_data
+
+    return out
+
+
+
+# Decoding
+# ========
+#
+# The inverse of the conversion functions above (requires NumPy).
+
+
+def decode_snes_tileset(data, bpp):
+    """
+    Decodes `convert_snes_tileset` bitplane data.
+
+    Returns a (n_tiles, 8, 8) uint8 NumPy array of pixel values.
+    """
+
+    import numpy
+
+    tile_size = 8 * bpp
+
+    raw = numpy.frombuffer(data, dtype=numpy.uint8)
+    if len(raw) % tile_size != 0:
+        raise ValueError(f"Tileset data size MUST BE a multiple of { tile_size }")
+
+    raw = raw.reshape(-1, tile_size)
+    n_tiles = len(raw)
+
+    pixels = numpy.zeros((n_tiles, 8, 8), dtype=numpy.uint8)
+
+    offset = 0
+    for b in range(0, bpp, 2):
+        n_planes = min(2, bpp - b)
+
+        # group[tile, y, plane]
+        group = raw[:, offset : offset + 8 * n_planes].reshape(n_tiles, 8, n_planes)
+        offset += 8 * n_planes
+
+        for i in range(n_planes):
+            bits = numpy.unpackbits(group[:, :, i, numpy.newaxis], axis=2)
+            pixels |= bits << (b + i)
+
+    return pixels
+
+
+
+def decode_mode7_tileset(data):
+    """ Returns a (n_tiles, 8, 8) uint8 NumPy array of the pixels in mode 7 tile data. """
+
+    import numpy
+
+    raw = numpy.frombuffer(data, dtype=numpy.uint8)
+    if len(raw) % 64 != 0:
+        raise ValueError('Mode 7 tileset data size MUST BE a multiple of 64')
+
+    return raw.reshape(-1, 8, 8)
+
+
+
+def decode_palette_data(data):
+    """ Returns a uint16 NumPy array of the SNES colours in `convert_palette_image` data. """
+
+    import numpy
+
+    return numpy.frombuffer(data, dtype='<u2').astype(numpy.uint16)
+
+
+
+def bgr555_to_rgb(colors):
+    """ Converts a NumPy array of SNES colours to an (..., 3) uint8 RGB array. """
+
+    import numpy
+
+    colors = numpy.asarray(colors, dtype=numpy.uint16)
+
+    rgb = numpy.stack([ colors & 31, (colors >> 5) & 31, (colors >> 10) & 31 ], axis=-1).astype(numpy.uint8)
+
+    return (rgb << 3) | (rgb >> 2)
+
+
+
+def decode_tilemap_data(data):
+    """
+    Decodes `create_tilemap_data` data.
+
+    Returns a tuple of NumPy arrays (tile_id, palette_id, order, hflip, vflip).
+    """
+
+    import numpy
+
+    words = numpy.frombuffer(data, dtype='<u2').astype(numpy.uint16)
+
+    return (words & 0x3ff,
+            (words >> 10) & 7,
+            (words >> 13) & 1,
+            ((words >> 14) & 1).astype(bool),
+            ((words >> 15) & 1).astype(bool))
+
+
+
+def render_tilemap(tilemap_data, tiles, bpp, width, palette=None, transparent_color_0=True):
+    """
+    Renders SNES tilemap data (a sequence of 32x32 screens in SNES order) that is `width` pixels wide.
+
+    `tiles` is a decoded tileset (see `decode_snes_tileset`).
+
+    If `palette` (a uint16 array of SNES colours) is None, returns a (height, width) array of
+    colour indexes (`palette_id * colors_per_palette + pixel`), otherwise returns a (height, width)
+    array of SNES colours.
+
+    If `transparent_color_0` is True, pixels with a value of 0 use colour 0 (the backdrop colour).
+    """
+
+    import numpy
+
+    if width % 256 != 0:
+        raise ValueError('Width MUST BE a multiple of 256')
+
+    tile_id, palette_id, order, hflip, vflip = decode_tilemap_data(tilemap_data)
+
+    screen_width = width // 256
+
+    if len(tile_id) % (32 * 32 * screen_width) != 0:
+        raise ValueError('Tilemap data does not match the given width')
+
+    if len(tile_id) and tile_id.max() >= len(tiles):
+        raise ValueError('Tilemap references a tile that is not in the tileset')
+
+    cells = tiles[tile_id]
+
+    cells = numpy.where(hflip[:, numpy.newaxis, numpy.newaxis], cells[:, :, ::-1], cells)
+    cells = numpy.where(vflip[:, numpy.newaxis, numpy.newaxis], cells[:, ::-1, :], cells)
+
+    indexes = cells.astype(numpy.uint16) + (palette_id.astype(numpy.uint16) << bpp)[:, numpy.newaxis, numpy.newaxis]
+
+    if transparent_color_0:
+        indexes[cells == 0] = 0
+
+    # [screen_y, screen_x, ty, tx, y, x] -> [screen_y, ty, y, screen_x, tx, x]
+    indexes = indexes.reshape(-1, screen_width, 32, 32, 8, 8).transpose(0, 2, 4, 1, 3, 5)
+    indexes = indexes.reshape(-1, width)
+
+    if palette is None:
+        return indexes
+
+    if indexes.max() >= len(palette):
+        raise ValueError('Tilemap references a colour that is not in the palette')
 
-    tilemap, tileset = convert_tilemap_and_tileset(
-                            extract_tilemap_tiles(image),
-                            create_palettes_map(palette_image, bpp))
+    return numpy.asarray(palette, dtype=numpy.uint16)[indexes]
 
-    tile_data = convert_snes_tileset(tileset, bpp)
 
-    palette_data = convert_palette_image(palette_image)
 
-    return tilemap, tile_data, palette_data
+def tileset_to_pixels(tiles, columns=16):
+    """ Arranges a decoded tileset into a (height, columns * 8) pixel array, padding the last row with 0. """
 
+    import numpy
 
+    n_rows = -(-len(tiles) // columns)
 
+    padded = numpy.zeros((n_rows * columns, 8, 8), dtype=tiles.dtype)
+    padded[:len(tiles)] = tiles
 
+    return padded.reshape(n_rows, columns, 8, 8).transpose(0, 2, 1, 3).reshape(n_rows * 8, columns * 8)
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim: set fenc=utf-8 ai ts=4 sw=4 sts=4 et:
+#
+#
+# SPDX-FileCopyrightText: © 2026 Marcus Rowe <undisbeliever@gmail.com>
+# SPDX-License-Identifier: Zlib
+#
+# Copyright © 2026 Marcus Rowe <undisbeliever@gmail.com>
+#
+# This software is provided 'as-is', without any express or implied warranty.
+# In no event will the authors be held liable for any damages arising from the
+# use of this software.
+#
+# Permission is granted to anyone to use this software for any purpose, including
+# commercial applications, and to alter it and redistribute it freely, subject to
+# the following restrictions:
+#
+#    1. The origin of this software must not be misrepresented; you must not
+#       claim that you wrote the original software. If you use this software in
+#       a product, an acknowledgment in the product documentation would be
+#       appreciated but is not required.
+#
+#    2. Altered source versions must be plainly marked as such, and must not be
+#       misrepresented as being the original software.
+#
+#    3. This notice may not be removed or altered from any source distribution.
+
+
+# Converts many resources in a single process pool.
+#
+# See `_jobs.py` for the manifest format.
+
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from _jobs import read_manifest, run_job
+from _profile import Profiler
+
+
+
+def run_jobs(jobs, n_processes=None, cache_dir=None):
+    """ Runs the jobs in a process pool.  Returns a summary dict. """
+
+    if not n_processes:
+        n_processes = os.cpu_count() or 1
+
+    start_time = time.perf_counter()
+
+    if n_processes == 1 or len(jobs) <= 1:
+        results = [ run_job(j, cache_dir) for j in jobs ]
+    else:
+        with ProcessPoolExecutor(max_workers=min(n_processes, len(jobs))) as executor:
+            results = list(executor.map(run_job, jobs, [ cache_dir ] * len(jobs)))
+
+    n_failed = sum(1 for r in results if r['status'] != 'ok')
+
+    profiler = Profiler()
+    for r in results:
+        profiler.merge(r['stats'])
+
+    return {
+        'jobs': len(results),
+        'succeeded': len(results) - n_failed,
+        'failed': n_failed,
+        'processes': n_processes,
+        'seconds': time.perf_counter() - start_time,
+        'stats': profiler.to_dict(),
+        'results': results,
+    }
+
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+                description='Runs the png2snes/image2snes jobs in a manifest file in a process pool.')
+
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='number of worker processes (default: number of CPUs)')
+    parser.add_argument('-s', '--summary', required=False,
+                        help='JSON summary output file')
+    parser.add_argument('--cache-dir', required=False,
+                        help='conversion cache directory')
+    parser.add_argument('--profile', action='store_true',
+                        help='print the time of each stage and the conversion counters (summed over all jobs)')
+    parser.add_argument('--stats-json', required=False,
+                        help='write the stage times and conversion counters (summed over all jobs) to a JSON file')
+    parser.add_argument('manifest', action='store',
+                        help='manifest file (.json or .jsonl)')
+
+    return parser.parse_args()
+
+
+
+def main():
+    args = parse_arguments()
+
+    jobs = read_manifest(args.manifest)
+
+    summary = run_jobs(jobs, args.jobs, args.cache_dir)
+
+    if args.summary:
+        with open(args.summary, 'w') as fp:
+            json.dump(summary, fp, indent=2)
+            fp.write('\n')
+
+    profiler = Profiler()
+    profiler.merge(summary['stats'])
+
+    if args.profile:
+        profiler.report()
+
+    if args.stats_json:
+        profiler.write_json(args.stats_json)
+
+    for r in summary['results']:
+        if r['status'] != 'ok':
+            print(f"{ r['input'] }: { r['error'] }", file=sys.stderr)
+
+    print(f"{ summary['succeeded'] } of { summary['jobs'] } jobs succeeded in { summary['seconds']:.2f} seconds")
+
+    if summary['failed']:
+        sys.exit(1)
+
+
+
+if __name__ == '__main__':
+    main()
+
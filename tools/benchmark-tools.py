@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim: set fenc=utf-8 ai ts=4 sw=4 sts=4 et:
+#
+#
+# SPDX-FileCopyrightText: © 2026 Marcus Rowe <undisbeliever@gmail.com>
+# SPDX-License-Identifier: Zlib
+#
+# Copyright © 2026 Marcus Rowe <undisbeliever@gmail.com>
+#
+# This software is provided 'as-is', without any express or implied warranty.
+# In no event will the authors be held liable for any damages arising from the
+# use of this software.
+#
+# Permission is granted to anyone to use this software for any purpose, including
+# commercial applications, and to alter it and redistribute it freely, subject to
+# the following restrictions:
+#
+#    1. The origin of this software must not be misrepresented; you must not
+#       claim that you wrote the original software. If you use this software in
+#       a product, an acknowledgment in the product documentation would be
+#       appreciated but is not required.
+#
+#    2. Altered source versions must be plainly marked as such, and must not be
+#       misrepresented as being the original software.
+#
+#    3. This notice may not be removed or altered from any source distribution.
+
+
+# Benchmarks the asset and ROM tools with synthetic inputs.
+#
+# Each stage is timed separately (best of `--repeat` runs) and the results can be
+# saved as JSON and compared against a saved baseline.
+
+
+import PIL.Image
+import argparse
+import importlib.util
+import json
+import os.path
+import platform
+import random
+import sys
+import time
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from _snes import extract_tilemap_tiles, create_palettes_map, convert_tilemap_and_tileset
+from _snes import convert_snes_tileset, convert_snes_tileset_fast, create_tilemap_data
+from _snes import convert_mode7_map
+from _compress import compress_rle, compress_lz77, decompress_lz77
+
+
+TILEMAP_SIZES = (256, 512)
+UNIQUE_TILES = (1, 16, 256, 1024)
+ROM_SIZES = (64 * 1024, 256 * 1024, 1024 * 1024, 3 * 1024 * 1024, 4 * 1024 * 1024)
+COMPRESS_SIZE = 64 * 1024
+MODE7_UNIQUE_TILES = 256
+
+BPP = 4
+N_PALETTES = 8
+
+DEFAULT_THRESHOLD = 1.25
+
+# Differences smaller than this are timer noise and never a regression
+MIN_DIFFERENCE = 0.5 / 1000
+
+
+
+def load_checksum_module():
+    # write-sfc-checksum.py cannot be imported with an import statement
+    filename = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'write-sfc-checksum.py')
+
+    spec = importlib.util.spec_from_file_location('write_sfc_checksum', filename)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    return module
+
+
+
+def make_palette_colors(rng):
+    # Unique colours (in SNES colour space) for every palette entry
+    colors = rng.sample(range(1 << 15), (1 << BPP) * N_PALETTES)
+
+    return [ ((c & 31) << 3, ((c >> 5) & 31) << 3, ((c >> 10) & 31) << 3) for c in colors ]
+
+
+
+def make_palette_image(palette_colors):
+    image = PIL.Image.new('RGB', (16, len(palette_colors) // 16))
+    image.putdata(palette_colors)
+
+    return image
+
+
+
+def make_tilemap_image(rng, palette_colors, size, n_unique_tiles):
+    colors_per_palette = 1 << BPP
+
+    unique_tiles = list()
+    for i in range(n_unique_tiles):
+        p = (i % N_PALETTES) * colors_per_palette
+        unique_tiles.append([ palette_colors[p + rng.randrange(colors_per_palette)] for j in range(64) ])
+
+    image = PIL.Image.new('RGB', (size, size))
+    pixels = image.load()
+
+    t_size = size // 8
+    for t in range(t_size * t_size):
+        tile = unique_tiles[t % n_unique_tiles]
+        tx = (t % t_size) * 8
+        ty = (t // t_size) * 8
+        for i, c in enumerate(tile):
+            pixels[tx + i % 8, ty + i // 8] = c
+
+    return image
+
+
+
+def make_mode7_image(rng, n_unique_tiles):
+    # A 1024x1024 px indexed image made of `n_unique_tiles` random tiles
+    unique_tiles = [ rng.randbytes(64) for i in range(n_unique_tiles) ]
+
+    data = bytearray(1024 * 1024)
+
+    for t in range(128 * 128):
+        tile = unique_tiles[rng.randrange(n_unique_tiles)]
+        o = (t // 128) * 8 * 1024 + (t % 128) * 8
+        for y in range(8):
+            data[o + y * 1024 : o + y * 1024 + 8] = tile[y * 8 : y * 8 + 8]
+
+    image = PIL.Image.new('P', (1024, 1024))
+    image.frombytes(bytes(data))
+
+    return image
+
+
+
+def make_tileset_data(rng, size):
+    # Tile data with repeated and blank bitplane rows, like a hand drawn tileset
+    rows = [ rng.randbytes(2) for i in range(64) ] + [ bytes(2) ] * 64
+
+    return b''.join(rng.choice(rows) for i in range(size // 2))
+
+
+
+def make_rom(rng, size, bank_size, header_offset, map_mode):
+    rom = bytearray(rng.randbytes(size))
+
+    rom[header_offset : header_offset + 13] = (6 * b'\x20') + bytes(7)
+    rom[header_offset + 0x25] = map_mode
+    rom[header_offset + 0x2a] = 0x33
+    rom[header_offset + 0x2c : header_offset + 0x30] = b'\xaa\xaa\x55\x55'
+
+    return bytes(rom)
+
+
+
+def best_time(function, repeat):
+    best = None
+
+    for i in range(repeat):
+        start = time.perf_counter()
+        function()
+        t = time.perf_counter() - start
+
+        if best is None or t < best:
+            best = t
+
+    return best
+
+
+
+def run_benchmarks(repeat, seed=0, verbose=True):
+    """ Returns a dict of benchmark name -> seconds. """
+
+    rng = random.Random(seed)
+
+    results = dict()
+
+    def bench(name, function):
+        t = best_time(function, repeat)
+        results[name] = t
+
+        if verbose:
+            print(f"{ name:56} { t * 1000:10.3f} ms")
+            sys.stdout.flush()
+
+
+    palette_colors = make_palette_colors(rng)
+    palette_image = make_palette_image(palette_colors)
+
+    bench('create_palettes_map', lambda: create_palettes_map(palette_image, BPP))
+    palettes_map = create_palettes_map(palette_image, BPP)
+
+    for size in TILEMAP_SIZES:
+        n_tiles = (size // 8) ** 2
+
+        for n_unique in UNIQUE_TILES:
+            if n_unique > n_tiles:
+                continue
+
+            suffix = f"{ size }px/{ n_unique }-tiles"
+
+            image = make_tilemap_image(rng, palette_colors, size, n_unique)
+
+            bench(f"extract_tilemap_tiles/{ suffix }", lambda: list(extract_tilemap_tiles(image)))
+            tiles = list(extract_tilemap_tiles(image))
+
+            bench(f"convert_tilemap_and_tileset/{ suffix }", lambda: convert_tilemap_and_tileset(tiles, palettes_map))
+            tilemap, tileset = convert_tilemap_and_tileset(tiles, palettes_map)
+
+            bench(f"convert_snes_tileset/{ suffix }", lambda: convert_snes_tileset(tileset, BPP))
+            if numpy is not None:
+                bench(f"convert_snes_tileset_fast/{ suffix }", lambda: convert_snes_tileset_fast(tileset, BPP))
+
+            bench(f"create_tilemap_data/{ suffix }", lambda: create_tilemap_data(tilemap, False))
+
+
+    tileset_data = make_tileset_data(rng, COMPRESS_SIZE)
+
+    bench(f"compress_rle/{ COMPRESS_SIZE // 1024 }KiB", lambda: compress_rle(tileset_data))
+    bench(f"compress_lz77/{ COMPRESS_SIZE // 1024 }KiB", lambda: compress_lz77(tileset_data))
+
+    lz77_data = compress_lz77(tileset_data)
+    bench(f"decompress_lz77/{ COMPRESS_SIZE // 1024 }KiB", lambda: decompress_lz77(lz77_data))
+
+
+    mode7_image = make_mode7_image(rng, MODE7_UNIQUE_TILES)
+    bench(f"convert_mode7_map/1024px/{ MODE7_UNIQUE_TILES }-tiles", lambda: convert_mode7_map(mode7_image))
+
+
+    checksum = load_checksum_module()
+    bank_size, header_offset, map_mode = checksum.MAPPINGS['lorom']
+
+    for rom_size in ROM_SIZES:
+        rom = make_rom(rng, rom_size, bank_size, header_offset, map_mode)
+
+        bench(f"calculate_checksum/{ rom_size // 1024 }KiB",
+              lambda: checksum.calculate_checksum(rom, bank_size, header_offset, map_mode))
+
+    return results
+
+
+
+def compare_results(results, baseline, threshold):
+    """ Returns a list of (name, baseline seconds, seconds) for the benchmarks that regressed. """
+
+    regressions = list()
+
+    for name, t in results.items():
+        base = baseline.get(name)
+
+        if base is not None and t > base * threshold and t - base > MIN_DIFFERENCE:
+            regressions.append((name, base, t))
+
+    return regressions
+
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+                description='Benchmarks the asset and ROM tools with synthetic inputs.')
+
+    parser.add_argument('-r', '--repeat', type=int, default=3,
+                        help='number of times each stage is run (the best time is used)')
+    parser.add_argument('-o', '--output', required=False,
+                        help='JSON results output file')
+    parser.add_argument('-c', '--compare', required=False,
+                        help='baseline JSON results file to compare against')
+    parser.add_argument('-t', '--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f"a stage has regressed if it is this many times slower than the baseline (default: { DEFAULT_THRESHOLD })")
+
+    return parser.parse_args()
+
+
+
+def main():
+    args = parse_arguments()
+
+    results = run_benchmarks(args.repeat)
+
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump({
+                'python': platform.python_version(),
+                'numpy': numpy is not None,
+                'repeat': args.repeat,
+                'results': results,
+            }, fp, indent=2)
+            fp.write('\n')
+
+    if args.compare:
+        with open(args.compare, 'r') as fp:
+            baseline = json.load(fp)['results']
+
+        regressions = compare_results(results, baseline, args.threshold)
+
+        for name, base, t in regressions:
+            print(f"REGRESSION: { name }: { base * 1000:.3f} ms -> { t * 1000:.3f} ms ({ t / base:.2f}x)", file=sys.stderr)
+
+        if regressions:
+            sys.exit(f"{ len(regressions) } stages regressed")
+        else:
+            print('No regressions')
+
+
+
+if __name__ == '__main__':
+    main()
+
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim: set fenc=utf-8 ai ts=4 sw=4 sts=4 et:
+#
+#
+# SPDX-FileCopyrightText: © 2026 Marcus Rowe <undisbeliever@gmail.com>
+# SPDX-License-Identifier: Zlib
+#
+# Copyright © 2026 Marcus Rowe <undisbeliever@gmail.com>
+#
+# This software is provided 'as-is', without any express or implied warranty.
+# In no event will the authors be held liable for any damages arising from the
+# use of this software.
+#
+# Permission is granted to anyone to use this software for any purpose, including
+# commercial applications, and to alter it and redistribute it freely, subject to
+# the following restrictions:
+#
+#    1. The origin of this software must not be misrepresented; you must not
+#       claim that you wrote the original software. If you use this software in
+#       a product, an acknowledgment in the product documentation would be
+#       appreciated but is not required.
+#
+#    2. Altered source versions must be plainly marked as such, and must not be
+#       misrepresented as being the original software.
+#
+#    3. This notice may not be removed or altered from any source distribution.
+
+
+import argparse
+
+from _cache import ConversionCache, DEFAULT_MAX_SIZE
+
+
+
+def print_stats(cache, args):
+    stats = cache.stats()
+
+    print(f"entries:  { stats['entries'] }")
+    print(f"size:     { stats['size'] / 1024:.1f} KiB")
+
+
+
+def prune(cache, args):
+    n_removed = cache.prune(args.max_size)
+
+    print(f"removed { n_removed } entries")
+    print_stats(cache, args)
+
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+                description='Shows statistics for (or prunes) the png2snes/image2snes conversion cache.')
+
+    parser.add_argument('cache_dir', action='store',
+                        help='conversion cache directory')
+
+    subparsers = parser.add_subparsers(required=True)
+
+    stats_parser = subparsers.add_parser('stats', help='show cache statistics')
+    stats_parser.set_defaults(function=print_stats)
+
+    prune_parser = subparsers.add_parser('prune', help='remove least recently used entries')
+    prune_parser.add_argument('--max-size', type=int, default=DEFAULT_MAX_SIZE,
+                              help=f"maximum cache size in bytes (default: { DEFAULT_MAX_SIZE })")
+    prune_parser.set_defaults(function=prune)
+
+    return parser.parse_args()
+
+
+
+def main():
+    args = parse_arguments()
+
+    args.function(ConversionCache(args.cache_dir), args)
+
+
+
+if __name__ == '__main__':
+    main()
+
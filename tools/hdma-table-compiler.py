@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim: set fenc=utf-8 ai ts=4 sw=4 sts=4 et:
+#
+#
+# SPDX-FileCopyrightText: © 2026 Marcus Rowe <undisbeliever@gmail.com>
+# SPDX-License-Identifier: Zlib
+#
+# Copyright © 2026 Marcus Rowe <undisbeliever@gmail.com>
+#
+# This software is provided 'as-is', without any express or implied warranty.
+# In no event will the authors be held liable for any damages arising from the
+# use of this software.
+#
+# Permission is granted to anyone to use this software for any purpose, including
+# commercial applications, and to alter it and redistribute it freely, subject to
+# the following restrictions:
+#
+#    1. The origin of this software must not be misrepresented; you must not
+#       claim that you wrote the original software. If you use this software in
+#       a product, an acknowledgment in the product documentation would be
+#       appreciated but is not required.
+#
+#    2. Altered source versions must be plainly marked as such, and must not be
+#       misrepresented as being the original software.
+#
+#    3. This notice may not be removed or altered from any source distribution.
+
+
+
+
+# Compiles per-scanline register values into a direct HDMA table.
+#
+# The values are read from a CSV file (one row per scanline, either a single integer or one
+# column per byte of the transfer pattern) or from a column of a png image (the palette index
+# of an indexed image or the SNES colour of an RGB image).
+#
+# Each table entry is either:
+#   * a non-repeat entry (1 - 128 scanlines), transferring a single value, or
+#   * a repeat entry (1 - 127 scanlines), transferring one value per scanline.
+#
+# The entries are chosen to produce the smallest table (then the fewest entries).
+
+
+import PIL.Image
+import argparse
+import csv
+import sys
+
+from _snes import convert_rgb_image
+from _cache import write_output_file
+
+
+# Number of bytes transferred per scanline by each DMAP transfer pattern
+TRANSFER_PATTERN_SIZES = {
+    0 : 1,
+    1 : 2,
+    2 : 2,
+    3 : 4,
+    4 : 4,
+    5 : 4,
+    6 : 2,
+    7 : 4,
+}
+
+MAX_NON_REPEAT_LINES = 128
+MAX_REPEAT_LINES = 127
+
+
+
+def read_csv_values(filename, unit_size):
+    """
+    Returns a list of `unit_size` byte values, one per scanline.
+
+    Each row contains either a single integer (stored little-endian) or `unit_size` byte values.
+    Blank rows and rows starting with `#` are ignored.
+    """
+
+    values = list()
+
+    with open(filename, 'r', newline='') as fp:
+        for line_number, row in enumerate(csv.reader(fp), 1):
+            row = [ c.strip() for c in row if c.strip() ]
+            if not row or row[0].startswith('#'):
+                continue
+
+            try:
+                ints = [ int(c, 0) for c in row ]
+
+                if len(ints) == 1:
+                    values.append(ints[0].to_bytes(unit_size, byteorder='little'))
+                elif len(ints) == unit_size:
+                    values.append(bytes(ints))
+                else:
+                    raise ValueError(f"expected 1 or { unit_size } values")
+
+            except (ValueError, OverflowError) as e:
+                raise ValueError(f"{ filename }:{ line_number }: { e }")
+
+    return values
+
+
+
+def read_image_column(filename, column, unit_size):
+    """
+    Returns a list of `unit_size` byte values, one per image row, from the pixels in `column`.
+
+    Indexed images use the palette index and RGB images use the SNES (BGR555) colour.
+    """
+
+    if unit_size < 1:
+        raise ValueError(f"Invalid unit size: { unit_size }")
+
+    image = PIL.Image.open(filename)
+
+    if image.mode not in ('P', 'RGB', 'RGBA'):
+        raise ValueError(f"{ filename }: image must be indexed or RGB (mode is { image.mode })")
+
+    if image.mode != 'P' and unit_size < 2:
+        raise ValueError(f"{ filename }: SNES colours do not fit in a { unit_size } byte transfer pattern")
+
+    if column < 0 or column >= image.width:
+        raise ValueError(f"{ filename }: invalid column (image is { image.width } px wide)")
+
+    if image.mode == 'P':
+        ints = [ image.getpixel((column, y)) for y in range(image.height) ]
+    else:
+        ints = convert_rgb_image(image.crop((column, 0, column + 1, image.height)))
+
+    return [ i.to_bytes(unit_size, byteorder='little') for i in ints ]
+
+
+
+def compile_hdma_table(values):
+    """
+    Returns the smallest list of `(repeat, n_lines, values)` entries for the per-scanline `values`.
+
+    A non-repeat entry holds a single value and a repeat entry holds `n_lines` values.
+    """
+
+    n_lines = len(values)
+    unit_size = len(values[0]) if values else 0
+
+    # run_length[i] = number of scanlines, starting at `i`, with the same value
+    run_length = [ 0 ] * (n_lines + 1)
+    for i in reversed(range(n_lines)):
+        if i + 1 < n_lines and values[i] == values[i + 1]:
+            run_length[i] = run_length[i + 1] + 1
+        else:
+            run_length[i] = 1
+
+    # best[i] = (table size, number of entries, -first entry scanlines, first entry is repeat)
+    # for scanlines i..n_lines.  Ties prefer the longest first entry.
+    best = [ None ] * (n_lines + 1)
+    best[n_lines] = (0, 0, 0, False)
+
+    for i in reversed(range(n_lines)):
+        b = None
+
+        for n in range(1, min(MAX_NON_REPEAT_LINES, run_length[i]) + 1):
+            cost = (best[i + n][0] + 1 + unit_size, best[i + n][1] + 1, -n, False)
+            if b is None or cost < b:
+                b = cost
+
+        for n in range(1, min(MAX_REPEAT_LINES, n_lines - i) + 1):
+            cost = (best[i + n][0] + 1 + n * unit_size, best[i + n][1] + 1, -n, True)
+            if cost[0:3] < b[0:3]:
+                b = cost
+
+        best[i] = b
+
+    entries = list()
+
+    i = 0
+    while i < n_lines:
+        size, n_entries, n, repeat = best[i]
+        n = -n
+
+        if repeat:
+            entries.append((True, n, values[i:i + n]))
+        else:
+            entries.append((False, n, [ values[i] ]))
+
+        i += n
+
+    return entries
+
+
+
+def hdma_table_data(entries):
+    data = bytearray()
+
+    for repeat, n_lines, entry_values in entries:
+        if repeat:
+            data.append(0x80 | n_lines)
+        else:
+            data.append(n_lines & 0x7f if n_lines < MAX_NON_REPEAT_LINES else 0x80)
+
+        for v in entry_values:
+            data += v
+
+    data.append(0)
+
+    return data
+
+
+
+def decode_hdma_table(data, unit_size):
+    """ Returns the list of per-scanline values of a direct HDMA table. """
+
+    values = list()
+    pos = 0
+
+    while data[pos] != 0:
+        line_counter = data[pos]
+        pos += 1
+
+        if line_counter > 0x80:
+            for i in range(line_counter & 0x7f):
+                values.append(bytes(data[pos:pos + unit_size]))
+                pos += unit_size
+        else:
+            n_lines = line_counter if line_counter < 0x80 else MAX_NON_REPEAT_LINES
+            values += [ bytes(data[pos:pos + unit_size]) ] * n_lines
+            pos += unit_size
+
+    return values
+
+
+
+def _format_values(entry_values, unit_size):
+    if unit_size % 2 == 0:
+        words = [ int.from_bytes(v[i:i + 2], byteorder='little') for v in entry_values for i in range(0, unit_size, 2) ]
+        return 'dw  ' + ', '.join(f"0x{ w :04x}" for w in words)
+    else:
+        return 'db  ' + ', '.join(f"0x{ b :02x}" for v in entry_values for b in v)
+
+
+
+def hdma_table_inc(entries, unit_size, name='HdmaTable', source=None):
+    """ Returns the HDMA table as the text of a bass include file. """
+
+    lines = list()
+
+    lines.append(f"// HDMA table for `{ source }` (generated by hdma-table-compiler.py, do not edit)" if source else
+                 '// HDMA table (generated by hdma-table-compiler.py, do not edit)')
+    lines.append('')
+    lines.append(f"{ name }:")
+
+    for repeat, n_lines, entry_values in entries:
+        scanlines = f"{ n_lines } scanlines" if n_lines != 1 else '1 scanline'
+
+        if repeat:
+            lines.append(f"    db  0x80 | { n_lines :<8} // { scanlines }, repeat entry")
+        else:
+            counter = n_lines if n_lines < MAX_NON_REPEAT_LINES else '0x80'
+            lines.append(f"    db  { counter :<15} // { scanlines }, non-repeat entry")
+
+        # One line of values per 16 scanlines
+        for i in range(0, len(entry_values), 16):
+            lines.append('        ' + _format_values(entry_values[i:i + 16], unit_size))
+
+    lines.append('    db  0               // End HDMA table')
+    lines.append('')
+    lines.append(f"constant { name }.size = pc() - { name }")
+    lines.append('')
+
+    return '\n'.join(lines)
+
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+                description='Compiles per-scanline register values into a direct HDMA table.')
+    parser.add_argument('-p', '--pattern', required=True, type=int,
+                        choices=TRANSFER_PATTERN_SIZES.keys(),
+                        help='DMAP transfer pattern')
+    parser.add_argument('-o', '--output', required=True,
+                        help='output file')
+    parser.add_argument('-f', '--format', required=False,
+                        choices=('inc', 'bin'), default='inc',
+                        help='output format, a bass include file or binary table data (default: inc)')
+    parser.add_argument('-c', '--column', required=False, type=int,
+                        help='read the values from this column of a png image (instead of a CSV file)')
+    parser.add_argument('--name', required=False, default='HdmaTable',
+                        help='label of the HDMA table (inc output, default: HdmaTable)')
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help='print the table size')
+    parser.add_argument('input_filename', action='store',
+                        help='CSV file (or png image with --column)')
+
+    return parser.parse_args()
+
+
+
+def main():
+    args = parse_arguments()
+
+    unit_size = TRANSFER_PATTERN_SIZES[args.pattern]
+
+    if args.column is not None:
+        values = read_image_column(args.input_filename, args.column, unit_size)
+    else:
+        values = read_csv_values(args.input_filename, unit_size)
+
+    if not values:
+        raise ValueError('No scanline values')
+
+    entries = compile_hdma_table(values)
+    data = hdma_table_data(entries)
+
+    if decode_hdma_table(data, unit_size) != values:
+        raise ValueError('HDMA table round-trip failed')
+
+    if args.format == 'bin':
+        write_output_file(args.output, data)
+    else:
+        write_output_file(args.output, hdma_table_inc(entries, unit_size, args.name, args.input_filename).encode('utf-8'))
+
+    if args.verbose:
+        print(f"{ len(values) } scanlines, { len(entries) } entries, { len(data) } bytes "
+              f"(all non-repeat: { len(values) * (1 + unit_size) + 1 } bytes)", file=sys.stderr)
+
+
+
+if __name__ == '__main__':
+    main()
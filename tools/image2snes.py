@@ -27,11 +27,18 @@
 #    3. This notice may not be removed or altered from any source distribution.
 
 
-import PIL.Image
 import argparse
+import io
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
 
 
-from _snes import image_to_snes, create_tilemap_data
+from _snes import images_to_snes, create_tilemap_data, FLIP_MODES
+from _cache import ConversionCache, write_output_file
+from _compress import COMPRESSION_FORMATS, compress_data
+from _profile import Profiler
+from _png import open_image
 
 
 FORMATS_BPP = {
@@ -55,10 +62,29 @@ def parse_arguments():
                         help='palette output file')
     parser.add_argument('--high-priority', required=False, action='store_true',
                         help='increase tilemap priority')
+    parser.add_argument('--flips', required=False,
+                        choices=FLIP_MODES.keys(), default='both',
+                        help='tile flips to search when deduplicating tiles (default: both)')
+    parser.add_argument('--shared-image', required=False, action='append', nargs=2, default=[],
+                        metavar=('IMAGE', 'TILEMAP'),
+                        help='convert another image into the same tileset and write its tilemap (can be repeated)')
+    parser.add_argument('--compress', required=False,
+                        choices=COMPRESSION_FORMATS.keys(), default='none',
+                        help='compress the tileset, tilemap and palette output files (default: none)')
+    parser.add_argument('--palette-image-output', required=False,
+                        help='write the palette image (useful when the palettes are generated automatically)')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='number of worker processes used to convert the screens (default: 1)')
+    parser.add_argument('--cache-dir', required=False,
+                        help='conversion cache directory')
+    parser.add_argument('--profile', action='store_true',
+                        help='print the time of each stage and the conversion counters')
+    parser.add_argument('--stats-json', required=False,
+                        help='write the stage times and conversion counters to a JSON file')
     parser.add_argument('image_filename', action='store',
                         help='Indexed png image')
-    parser.add_argument('palette_image', action='store',
-                        help='Palette png image')
+    parser.add_argument('palette_image', action='store', nargs='?',
+                        help='Palette png image (if missing, the palettes are generated automatically)')
 
     args = parser.parse_args()
 
@@ -66,26 +92,151 @@ def parse_arguments():
 
 
 
-def main():
-    args = parse_arguments()
+def create_palette_image(palette_data):
+    # Returns a 16px wide RGB palette image
+
+    import PIL.Image
+
+    colors = [ palette_data[i] | (palette_data[i + 1] << 8) for i in range(0, len(palette_data), 2) ]
+
+    image = PIL.Image.new('RGB', (16, (len(colors) + 15) // 16))
+    image.putdata([ ((c & 31) << 3, ((c >> 5) & 31) << 3, ((c >> 10) & 31) << 3) for c in colors ])
+
+    return image
+
+
+
+def convert_image_file(image_filename, palette_filename, tile_format,
+                       tileset_output, tilemap_output, palette_output,
+                       high_priority=False, flips='both', cache_dir=None, profiler=None,
+                       palette_image_output=None, shared_images=(), compression='none', executor=None):
+    """
+    Converts a png image file (and its palette image) and writes the tileset, tilemap and palette output files.
+
+    If `palette_filename` is None, the palettes are generated automatically (see `create_auto_palette()`)
+    and the number of tiles that needed their colours merged is printed.
+    If `palette_image_output` is not None, the palette is also written as a png image.
+
+    The tileset, tilemap and palette output files are compressed with `compression`
+    (see `_compress.COMPRESSION_FORMATS`).
+
+    `shared_images` is a list of (image_filename, tilemap_output) tuples.  These images are converted
+    with the same palette into the same tileset, with one tilemap per image.
+
+    If `executor` is not None, the screens are converted in its worker processes.  The output is the
+    same as a single process conversion.
+
+    If `profiler` is not None, the time of each stage and the conversion counters are recorded.
+
+    Returns True if the outputs were copied from the conversion cache.
+    """
+
+    if profiler is None:
+        profiler = Profiler()
+
+    bpp = FORMATS_BPP[tile_format]
+    n_merged_before = profiler.counters.get('merged_tiles', 0)
+
+    image_files = [ (image_filename, tilemap_output) ] + list(shared_images)
 
-    bpp = FORMATS_BPP[args.format]
+    outputs = {
+        'tiles'   : tileset_output,
+        'tilemap' : tilemap_output,
+        'palette' : palette_output,
+    }
+    for i, (f, t) in enumerate(shared_images):
+        outputs[f"tilemap{ i + 1 }"] = t
+    if palette_image_output:
+        outputs['palette_image'] = palette_image_output
 
-    image = PIL.Image.open(args.image_filename)
-    palette_image = PIL.Image.open(args.palette_image)
+    auto_palette = palette_filename is None
+    input_files = [ f for f, t in image_files ]
+    if not auto_palette:
+        input_files.append(palette_filename)
 
-    tilemap, tileset_data, palette_data = image_to_snes(image, palette_image, bpp)
+    cache = None
+    if cache_dir:
+        with profiler.stage('cache'):
+            cache = ConversionCache(cache_dir)
+            cache_key = cache.key('image2snes', input_files,
+                                  { 'bpp': bpp, 'high_priority': high_priority, 'flips': flips,
+                                    'auto_palette': auto_palette, 'compression': compression })
+
+            if cache.fetch(cache_key, outputs):
+                profiler.count('cache_hits')
+                return True
+
+    with profiler.stage('decode'):
+        # Only the image headers are read here, the pixels are decoded by `images_to_snes()`
+        images = [ open_image(f) for f, t in image_files ]
+
+        palette_image = None
+        if not auto_palette:
+            palette_image = open_image(palette_filename)
+            palette_image.load()
+
+    tilemaps, tileset_data, palette_data = images_to_snes(images, palette_image, bpp, FLIP_MODES[flips],
+                                                          profiler=profiler, executor=executor)
+
+    for tilemap, (f, t) in zip(tilemaps, image_files):
+        with profiler.stage('tilemap'):
+            tilemap_data = create_tilemap_data(tilemap, high_priority)
+
+        if compression != 'none':
+            with profiler.stage('compress'):
+                profiler.count('uncompressed_bytes', len(tilemap_data))
+                tilemap_data = compress_data(tilemap_data, compression)
+
+        with profiler.stage('write'):
+            write_output_file(t, tilemap_data)
+        profiler.count('bytes_written', len(tilemap_data))
+
+    if palette_image_output:
+        with profiler.stage('write'):
+            png_data = io.BytesIO()
+            create_palette_image(palette_data).save(png_data, 'PNG')
+            write_output_file(palette_image_output, png_data.getbuffer())
+
+    if compression != 'none':
+        with profiler.stage('compress'):
+            profiler.count('uncompressed_bytes', len(tileset_data) + len(palette_data))
+            tileset_data = compress_data(tileset_data, compression)
+            palette_data = compress_data(palette_data, compression)
+
+    with profiler.stage('write'):
+        write_output_file(tileset_output, tileset_data)
+        write_output_file(palette_output, palette_data)
+    profiler.count('bytes_written', len(tileset_data) + len(palette_data))
+
+    if auto_palette:
+        n_merged = profiler.counters.get('merged_tiles', 0) - n_merged_before
+        if n_merged:
+            print(f"{ image_filename }: { n_merged } tiles needed colour merging", file=sys.stderr)
+
+    if cache:
+        with profiler.stage('cache'):
+            cache.store(cache_key, outputs)
+
+    return False
+
+
+
+def main():
+    args = parse_arguments()
 
-    tilemap_data = create_tilemap_data(tilemap, args.high_priority)
+    profiler = Profiler()
 
-    with open(args.tileset_output, 'wb') as fp:
-        fp.write(tileset_data)
+    with ProcessPoolExecutor(max_workers=args.jobs) if args.jobs > 1 else nullcontext() as executor:
+        convert_image_file(args.image_filename, args.palette_image, args.format,
+                           args.tileset_output, args.tilemap_output, args.palette_output,
+                           args.high_priority, args.flips, args.cache_dir, profiler,
+                           args.palette_image_output, args.shared_image, args.compress, executor)
 
-    with open(args.tilemap_output, 'wb') as fp:
-        fp.write(tilemap_data)
+    if args.profile:
+        profiler.report()
 
-    with open(args.palette_output, 'wb') as fp:
-        fp.write(palette_data)
+    if args.stats_json:
+        profiler.write_json(args.stats_json)
 
 
 
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim: set fenc=utf-8 ai ts=4 sw=4 sts=4 et:
+#
+#
+# SPDX-FileCopyrightText: © 2026 Marcus Rowe <undisbeliever@gmail.com>
+# SPDX-License-Identifier: Zlib
+#
+# Copyright © 2026 Marcus Rowe <undisbeliever@gmail.com>
+#
+# This software is provided 'as-is', without any express or implied warranty.
+# In no event will the authors be held liable for any damages arising from the
+# use of this software.
+#
+# Permission is granted to anyone to use this software for any purpose, including
+# commercial applications, and to alter it and redistribute it freely, subject to
+# the following restrictions:
+#
+#    1. The origin of this software must not be misrepresented; you must not
+#       claim that you wrote the original software. If you use this software in
+#       a product, an acknowledgment in the product documentation would be
+#       appreciated but is not required.
+#
+#    2. Altered source versions must be plainly marked as such, and must not be
+#       misrepresented as being the original software.
+#
+#    3. This notice may not be removed or altered from any source distribution.
+
+
+
+
+# Converts an indexed png image (up to 1024x1024 px) into a mode 7 map.
+#
+# The output is either interleaved VRAM data (tilemap in the low bytes, tiles in the high bytes)
+# or separate tilemap and tileset files for two VMAIN low/high byte DMA transfers.
+
+
+import PIL.Image
+import argparse
+
+
+from _snes import convert_mode7_map, interleave_mode7_data
+from _cache import ConversionCache, write_output_file
+from _profile import Profiler
+from png2snes import convert_palette
+
+
+
+def convert_mode7_file(image_filename, palette_output, tilemap_output=None, tileset_output=None,
+                       interleaved_output=None, cache_dir=None, profiler=None):
+    """
+    Converts a png image file into a mode 7 map and writes the palette and the tilemap and tileset
+    (`interleaved_output` and/or `tilemap_output` and `tileset_output`) output files.
+
+    If `profiler` is not None, the time of each stage and the conversion counters are recorded.
+
+    Returns True if the outputs were copied from the conversion cache.
+    """
+
+    if profiler is None:
+        profiler = Profiler()
+
+    outputs = { 'palette' : palette_output }
+    if tilemap_output:
+        outputs['tilemap'] = tilemap_output
+    if tileset_output:
+        outputs['tiles'] = tileset_output
+    if interleaved_output:
+        outputs['interleaved'] = interleaved_output
+
+    cache = None
+    if cache_dir:
+        with profiler.stage('cache'):
+            cache = ConversionCache(cache_dir)
+            cache_key = cache.key('mode7map2snes', [ image_filename ], sorted(outputs))
+
+            if cache.fetch(cache_key, outputs):
+                profiler.count('cache_hits')
+                return True
+
+    with profiler.stage('decode'):
+        image = PIL.Image.open(image_filename)
+        image.load()
+
+    with profiler.stage('palette'):
+        palette = convert_palette(image.palette, 256)
+
+    with profiler.stage('convert'):
+        tilemap_data, tileset_data = convert_mode7_map(image)
+
+    n_bytes = len(palette)
+
+    with profiler.stage('write'):
+        write_output_file(palette_output, palette)
+
+        if tilemap_output:
+            write_output_file(tilemap_output, tilemap_data)
+            n_bytes += len(tilemap_data)
+
+        if tileset_output:
+            write_output_file(tileset_output, tileset_data)
+            n_bytes += len(tileset_data)
+
+        if interleaved_output:
+            interleaved_data = interleave_mode7_data(tilemap_data, tileset_data)
+            write_output_file(interleaved_output, interleaved_data)
+            n_bytes += len(interleaved_data)
+
+    profiler.count('tiles', len(tilemap_data))
+    profiler.count('unique_tiles', len(tileset_data) // 64)
+    profiler.count('bytes_written', n_bytes)
+
+    if cache:
+        with profiler.stage('cache'):
+            cache.store(cache_key, outputs)
+
+    return False
+
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+                description='Converts an indexed png image (up to 1024x1024 px) into a mode 7 map.')
+    parser.add_argument('-p', '--palette-output', required=True,
+                        help='palette output file')
+    parser.add_argument('-m', '--tilemap-output', required=False,
+                        help='tilemap output file (VRAM low bytes)')
+    parser.add_argument('-t', '--tileset-output', required=False,
+                        help='tileset output file (VRAM high bytes)')
+    parser.add_argument('-i', '--interleaved-output', required=False,
+                        help='interleaved tilemap and tileset output file (32 KiB of VRAM data)')
+    parser.add_argument('--cache-dir', required=False,
+                        help='conversion cache directory')
+    parser.add_argument('--profile', action='store_true',
+                        help='print the time of each stage and the conversion counters')
+    parser.add_argument('--stats-json', required=False,
+                        help='write the stage times and conversion counters to a JSON file')
+    parser.add_argument('image_filename', action='store',
+                        help='Indexed png image')
+
+    args = parser.parse_args()
+
+    if not args.interleaved_output and not (args.tilemap_output and args.tileset_output):
+        parser.error('either --interleaved-output or both --tilemap-output and --tileset-output are required')
+
+    return args
+
+
+
+def main():
+    args = parse_arguments()
+
+    profiler = Profiler()
+
+    convert_mode7_file(args.image_filename, args.palette_output, args.tilemap_output, args.tileset_output,
+                       args.interleaved_output, args.cache_dir, profiler)
+
+    if args.profile:
+        profiler.report()
+
+    if args.stats_json:
+        profiler.write_json(args.stats_json)
+
+
+
+if __name__ == '__main__':
+    main()
@@ -27,12 +27,14 @@
 #    3. This notice may not be removed or altered from any source distribution.
 
 
-import PIL.Image
 import argparse
-import struct
 
 
-from _snes import convert_rgb_color, convert_snes_tileset
+from _snes import ImageBuffer, convert_rgb_data, convert_palette_colors, convert_snes_tileset_fast
+from _cache import ConversionCache, write_output_file
+from _compress import COMPRESSION_FORMATS, compress_data
+from _profile import Profiler
+from _png import open_image
 
 
 def convert_palette(palette, max_colors):
@@ -48,13 +50,7 @@ def convert_palette(palette, max_colors):
     if n_colors > max_colors:
         raise ValueError('Image palette has too many colors')
 
-    snes_pal_data = bytearray()
-
-    for c in struct.iter_unpack('BBB', pdata):
-        u16 = convert_rgb_color(c)
-
-        snes_pal_data.append(u16 & 0xff);
-        snes_pal_data.append(u16 >> 8);
+    snes_pal_data = convert_palette_colors(convert_rgb_data(pdata))
 
     assert len(snes_pal_data) == n_colors * 2;
 
@@ -72,20 +68,17 @@ def extract_tiles(image):
     t_width = image.width // 8
     t_height = image.height // 8
 
-    img_data = image.getdata()
+    buffer = ImageBuffer(image)
+
+    if buffer.pixel_size != 1:
+        raise ValueError('Image must be indexed')
 
     for ty in range(t_height):
         ty *= 8
         for tx in range(t_width):
             tx *= 8
 
-            tile_data = bytearray()
-
-            for y in range(ty, ty + 8):
-                for x in range(tx, tx + 8):
-                    tile_data.append(image.getpixel((x, y)))
-
-            yield tile_data
+            yield bytearray(buffer.tile_bytes(tx, ty, 8))
 
 
 
@@ -101,11 +94,11 @@ def convert_mode7_tileset(tiles):
 FORMATS = {
     'm7'    : convert_mode7_tileset,
     'mode7' : convert_mode7_tileset,
-    '1bpp'  : lambda tiles : convert_snes_tileset(tiles, 1),
-    '2bpp'  : lambda tiles : convert_snes_tileset(tiles, 2),
-    '3bpp'  : lambda tiles : convert_snes_tileset(tiles, 3),
-    '4bpp'  : lambda tiles : convert_snes_tileset(tiles, 4),
-    '8bpp'  : lambda tiles : convert_snes_tileset(tiles, 8),
+    '1bpp'  : lambda tiles : convert_snes_tileset_fast(tiles, 1),
+    '2bpp'  : lambda tiles : convert_snes_tileset_fast(tiles, 2),
+    '3bpp'  : lambda tiles : convert_snes_tileset_fast(tiles, 3),
+    '4bpp'  : lambda tiles : convert_snes_tileset_fast(tiles, 4),
+    '8bpp'  : lambda tiles : convert_snes_tileset_fast(tiles, 8),
 }
 
 
@@ -121,6 +114,15 @@ def parse_arguments():
     parser.add_argument('-c', '--max-colors', required=False,
                         type=int, default=256,
                         help='maximum number of colors')
+    parser.add_argument('--compress', required=False,
+                        choices=COMPRESSION_FORMATS.keys(), default='none',
+                        help='compress the output files (default: none)')
+    parser.add_argument('--cache-dir', required=False,
+                        help='conversion cache directory')
+    parser.add_argument('--profile', action='store_true',
+                        help='print the time of each stage and the conversion counters')
+    parser.add_argument('--stats-json', required=False,
+                        help='write the stage times and conversion counters to a JSON file')
     parser.add_argument('image_filename', action='store',
                         help='Indexed png image')
 
@@ -129,21 +131,85 @@ def parse_arguments():
     return args;
 
 
+def convert_png_file(image_filename, tile_format, tileset_output, palette_output,
+                     max_colors=256, cache_dir=None, profiler=None, compression='none'):
+    """
+    Converts an indexed png image file and writes the tileset and palette output files.
+
+    The output files are compressed with `compression` (see `_compress.COMPRESSION_FORMATS`).
+
+    If `profiler` is not None, the time of each stage and the conversion counters are recorded.
+
+    Returns True if the outputs were copied from the conversion cache.
+    """
+
+    if profiler is None:
+        profiler = Profiler()
+
+    tile_converter = FORMATS[tile_format]
+
+    outputs = {
+        'tiles'   : tileset_output,
+        'palette' : palette_output,
+    }
+
+    cache = None
+    if cache_dir:
+        with profiler.stage('cache'):
+            cache = ConversionCache(cache_dir)
+            cache_key = cache.key('png2snes', [ image_filename ],
+                                  { 'format': tile_format, 'max_colors': max_colors, 'compression': compression })
+
+            if cache.fetch(cache_key, outputs):
+                profiler.count('cache_hits')
+                return True
+
+    with profiler.stage('decode'):
+        image = open_image(image_filename)
+        image.load()
+
+    with profiler.stage('palette'):
+        palette = convert_palette(image.palette, max_colors)
+
+    with profiler.stage('extract'):
+        tiles = list(extract_tiles(image))
+
+    with profiler.stage('encode'):
+        tileset = tile_converter(tiles)
+
+    if compression != 'none':
+        with profiler.stage('compress'):
+            profiler.count('uncompressed_bytes', len(tileset) + len(palette))
+            tileset = compress_data(tileset, compression)
+            palette = compress_data(palette, compression)
+
+    with profiler.stage('write'):
+        write_output_file(tileset_output, tileset)
+        write_output_file(palette_output, palette)
+
+    profiler.count('tiles', len(tiles))
+    profiler.count('bytes_written', len(tileset) + len(palette))
+
+    if cache:
+        with profiler.stage('cache'):
+            cache.store(cache_key, outputs)
+
+    return False
+
+
 def main():
     args = parse_arguments()
 
-    tile_converter = FORMATS[args.format]
-
-    image = PIL.Image.open(args.image_filename)
+    profiler = Profiler()
 
-    palette = convert_palette(image.palette, args.max_colors)
-    tileset = tile_converter(extract_tiles(image))
+    convert_png_file(args.image_filename, args.format, args.tileset_output, args.palette_output,
+                     args.max_colors, args.cache_dir, profiler, args.compress)
 
-    with open(args.tileset_output, 'wb') as fp:
-        fp.write(tileset)
+    if args.profile:
+        profiler.report()
 
-    with open(args.palette_output, 'wb') as fp:
-        fp.write(palette)
+    if args.stats_json:
+        profiler.write_json(args.stats_json)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim: set fenc=utf-8 ai ts=4 sw=4 sts=4 et:
+#
+#
+# SPDX-FileCopyrightText: © 2026 Marcus Rowe <undisbeliever@gmail.com>
+# SPDX-License-Identifier: Zlib
+#
+# Copyright © 2026 Marcus Rowe <undisbeliever@gmail.com>
+#
+# This software is provided 'as-is', without any express or implied warranty.
+# In no event will the authors be held liable for any damages arising from the
+# use of this software.
+#
+# Permission is granted to anyone to use this software for any purpose, including
+# commercial applications, and to alter it and redistribute it freely, subject to
+# the following restrictions:
+#
+#    1. The origin of this software must not be misrepresented; you must not
+#       claim that you wrote the original software. If you use this software in
+#       a product, an acknowledgment in the product documentation would be
+#       appreciated but is not required.
+#
+#    2. Altered source versions must be plainly marked as such, and must not be
+#       misrepresented as being the original software.
+#
+#    3. This notice may not be removed or altered from any source distribution.
+
+
+# Decodes png2snes/image2snes output files back into png images and verifies
+# that the converted resources match their source images.
+#
+# Requires NumPy.
+
+
+import PIL.Image
+import argparse
+import sys
+
+import numpy
+
+from _snes import decode_snes_tileset, decode_mode7_tileset, decode_palette_data, bgr555_to_rgb
+from _snes import render_tilemap, tileset_to_pixels, convert_rgb_array
+from _jobs import read_manifest
+from _compress import COMPRESSION_FORMATS, decompress_data
+
+
+FORMATS_BPP = {
+    'm7'    : 8,
+    'mode7' : 8,
+    '1bpp'  : 1,
+    '2bpp'  : 2,
+    '3bpp'  : 3,
+    '4bpp'  : 4,
+    '8bpp'  : 8,
+}
+
+
+
+def read_file(filename, compression='none'):
+    with open(filename, 'rb') as fp:
+        return decompress_data(fp.read(), compression)
+
+
+
+def decode_tileset_file(filename, tile_format, compression='none'):
+    data = read_file(filename, compression)
+
+    if tile_format in ('m7', 'mode7'):
+        return decode_mode7_tileset(data)
+    else:
+        return decode_snes_tileset(data, FORMATS_BPP[tile_format])
+
+
+
+def indexed_image(pixels, palette):
+    # Returns a 'P' mode image.  `palette` is a uint16 array of SNES colours (or None for a grayscale palette).
+
+    if pixels.max(initial=0) > 255:
+        raise ValueError('Too many colours for an indexed image')
+
+    image = PIL.Image.fromarray(pixels.astype(numpy.uint8), 'P')
+
+    if palette is not None:
+        image.putpalette(bgr555_to_rgb(palette[:256]).tobytes())
+    else:
+        levels = max(int(pixels.max(initial=0)), 1)
+        image.putpalette(bytes(min(i * 255 // levels, 255) for i in range(256) for c in range(3)))
+
+    return image
+
+
+
+def tileset_command(args):
+    bpp = FORMATS_BPP[args.format]
+
+    tiles = decode_tileset_file(args.tileset, args.format, args.compress)
+
+    palette = decode_palette_data(read_file(args.palette, args.compress)) if args.palette else None
+
+    pixels = tileset_to_pixels(tiles, args.columns).astype(numpy.uint16)
+    if args.palette_id:
+        pixels += args.palette_id << bpp
+
+    indexed_image(pixels, palette).save(args.output)
+
+
+
+def tilemap_command(args):
+    bpp = FORMATS_BPP[args.format]
+
+    tiles = decode_tileset_file(args.tileset, args.format, args.compress)
+    palette = decode_palette_data(read_file(args.palette, args.compress))
+
+    colors = render_tilemap(read_file(args.tilemap, args.compress), tiles, bpp, args.width, palette, not args.opaque)
+
+    PIL.Image.fromarray(bgr555_to_rgb(colors), 'RGB').save(args.output)
+
+
+
+def tile_grid(pixels):
+    # Splits a (height, width) pixel array into (n_tiles, 8, 8) tiles (left to right, top to bottom)
+
+    h, w = pixels.shape
+
+    return pixels.reshape(h // 8, 8, w // 8, 8).transpose(0, 2, 1, 3).reshape(-1, 8, 8)
+
+
+
+def verify_png2snes_job(job):
+    outputs = job['outputs']
+
+    image = PIL.Image.open(job['input'])
+
+    source_tiles = tile_grid(numpy.asarray(image, dtype=numpy.uint8))
+    tiles = decode_tileset_file(outputs['tiles'], job['format'], job.get('compress', 'none'))
+
+    if not numpy.array_equal(tiles, source_tiles):
+        raise ValueError('decoded tileset does not match the source image')
+
+    data_type, pdata = image.palette.getdata()
+    source_palette = convert_rgb_array(numpy.frombuffer(pdata, dtype=numpy.uint8).reshape(-1, 3))
+
+    palette = decode_palette_data(read_file(outputs['palette'], job.get('compress', 'none')))
+
+    if not numpy.array_equal(palette, source_palette):
+        raise ValueError('decoded palette does not match the source image palette')
+
+
+
+def verify_image2snes_job(job):
+    outputs = job['outputs']
+
+    tiles = decode_tileset_file(outputs['tiles'], job['format'], job.get('compress', 'none'))
+    palette = decode_palette_data(read_file(outputs['palette'], job.get('compress', 'none')))
+
+    images = [ (job['input'], outputs['tilemap']) ]
+    images += [ (s['input'], s['tilemap']) for s in job.get('shared_images', ()) ]
+
+    for image_filename, tilemap_filename in images:
+        image = PIL.Image.open(image_filename).convert('RGB')
+
+        source = convert_rgb_array(numpy.asarray(image))
+
+        colors = render_tilemap(read_file(tilemap_filename, job.get('compress', 'none')), tiles, FORMATS_BPP[job['format']], image.width,
+                                palette, transparent_color_0=False)
+
+        if colors.shape != source.shape:
+            raise ValueError(f"{ image_filename }: rendered tilemap is the wrong size ({ colors.shape[1] }x{ colors.shape[0] })")
+
+        n_different = int(numpy.count_nonzero(colors != source))
+        if n_different:
+            raise ValueError(f"{ image_filename }: rendered tilemap does not match the source image ({ n_different } pixels differ)")
+
+
+
+VERIFY_FUNCTIONS = {
+    'png2snes'   : verify_png2snes_job,
+    'image2snes' : verify_image2snes_job,
+}
+
+
+
+def verify_command(args):
+    n_failed = 0
+
+    jobs = read_manifest(args.manifest)
+
+    for job in jobs:
+        try:
+            VERIFY_FUNCTIONS[job['tool']](job)
+        except Exception as e:
+            n_failed += 1
+            print(f"{ job.get('input') }: FAILED ({ e })", file=sys.stderr)
+
+    print(f"{ len(jobs) - n_failed } of { len(jobs) } resources round-trip correctly")
+
+    if n_failed:
+        sys.exit(1)
+
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+                description='Decodes SNES tile, tilemap and palette data into png images.')
+
+    subparsers = parser.add_subparsers(required=True)
+
+    p = subparsers.add_parser('tileset', help='decode a tileset into an indexed png image')
+    p.add_argument('-f', '--format', required=True, choices=FORMATS_BPP.keys(),
+                   help='tile format')
+    p.add_argument('-p', '--palette', required=False,
+                   help='palette file')
+    p.add_argument('--palette-id', type=int, default=0,
+                   help='palette to display the tiles with')
+    p.add_argument('-c', '--columns', type=int, default=16,
+                   help='number of tiles per row (default: 16)')
+    p.add_argument('--compress', choices=COMPRESSION_FORMATS.keys(), default='none',
+                   help='compression format of the input files (default: none)')
+    p.add_argument('tileset', help='tileset file')
+    p.add_argument('output', help='png output file')
+    p.set_defaults(function=tileset_command)
+
+    p = subparsers.add_parser('tilemap', help='render a tilemap into an RGB png image')
+    p.add_argument('-f', '--format', required=True, choices=[ '2bpp', '4bpp', '8bpp' ],
+                   help='tile format')
+    p.add_argument('-t', '--tileset', required=True,
+                   help='tileset file')
+    p.add_argument('-m', '--tilemap', required=True,
+                   help='tilemap file')
+    p.add_argument('-p', '--palette', required=True,
+                   help='palette file')
+    p.add_argument('-w', '--width', type=int, default=256,
+                   help='image width in pixels (default: 256)')
+    p.add_argument('--opaque', action='store_true',
+                   help='draw colour 0 of every palette instead of the backdrop colour')
+    p.add_argument('--compress', choices=COMPRESSION_FORMATS.keys(), default='none',
+                   help='compression format of the input files (default: none)')
+    p.add_argument('output', help='png output file')
+    p.set_defaults(function=tilemap_command)
+
+    p = subparsers.add_parser('verify', help='verify the converted resources in a manifest match their source images')
+    p.add_argument('manifest', help='manifest file (.json or .jsonl)')
+    p.set_defaults(function=verify_command)
+
+    return parser.parse_args()
+
+
+
+def main():
+    args = parse_arguments()
+
+    args.function(args)
+
+
+
+if __name__ == '__main__':
+    main()
+
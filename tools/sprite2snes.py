@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim: set fenc=utf-8 ai ts=4 sw=4 sts=4 et:
+#
+#
+# SPDX-FileCopyrightText: © 2026 Marcus Rowe <undisbeliever@gmail.com>
+# SPDX-License-Identifier: Zlib
+#
+# Copyright © 2026 Marcus Rowe <undisbeliever@gmail.com>
+#
+# This software is provided 'as-is', without any express or implied warranty.
+# In no event will the authors be held liable for any damages arising from the
+# use of this software.
+#
+# Permission is granted to anyone to use this software for any purpose, including
+# commercial applications, and to alter it and redistribute it freely, subject to
+# the following restrictions:
+#
+#    1. The origin of this software must not be misrepresented; you must not
+#       claim that you wrote the original software. If you use this software in
+#       a product, an acknowledgment in the product documentation would be
+#       appreciated but is not required.
+#
+#    2. Altered source versions must be plainly marked as such, and must not be
+#       misrepresented as being the original software.
+#
+#    3. This notice may not be removed or altered from any source distribution.
+
+
+
+
+# Packs the frames of a sprite sheet into a deduplicated 4bpp OBJ tileset and metasprite tables.
+#
+# The sprite sheet is an indexed png image containing up to 8 palettes of 16 colours.
+# Colour 0 of every palette is transparent.
+#
+# Each frame is split into 8x8 or 16x16 px objects.  Transparent objects are skipped and the
+# remaining objects are deduplicated (including flipped objects) into the tileset.  The 16x16 px
+# tiles are arranged in the OBJ name table layout (tile N uses characters N, N+1, N+16 and N+17).
+#
+# The metasprite output is a bass include file containing a table of the frames.  Each frame is
+# a count byte followed by `count` 4 byte objects:
+#   x offset (signed), y offset (signed), character, attributes (vhoopppN)
+
+
+import PIL.Image
+import argparse
+import os.path
+from collections import namedtuple
+
+
+from _snes import ImageBuffer, TileDeduplicator, FLIP_MODES, split_large_tile, convert_snes_tileset_fast
+from _snes import count_dedup_stats
+from _cache import ConversionCache, write_output_file
+from _profile import Profiler
+from png2snes import convert_palette
+
+
+BPP = 4
+OBJECT_SIZES = (8, 16)
+
+# Two OBJ name tables of 256 characters
+MAX_CHARACTERS = 512
+
+
+ObjEntry = namedtuple('ObjEntry', ('x', 'y', 'tile_id', 'palette_id', 'hflip', 'vflip'))
+
+
+
+def parse_size(s):
+    try:
+        w, h = s.lower().split('x')
+        return int(w), int(h)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid size: { s } (expected WIDTHxHEIGHT)")
+
+
+
+def parse_position(s):
+    try:
+        x, y = s.split(',')
+        return int(x), int(y)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid position: { s } (expected X,Y)")
+
+
+
+def extract_frame_objects(buffer, frame_x, frame_y, frame_width, frame_height, object_size):
+    """
+    Yields a tuple of (x, y, palette_id, tile_data) for each non-transparent object in a frame.
+
+    `x` and `y` are relative to the top-left corner of the frame.
+    """
+
+    for y in range(0, frame_height, object_size):
+        for x in range(0, frame_width, object_size):
+            data = buffer.tile_bytes(frame_x + x, frame_y + y, object_size)
+
+            palettes = set(c >> 4 for c in data if c & 0xf)
+            if not palettes:
+                continue
+
+            if len(palettes) > 1:
+                raise ValueError(f"Object at { frame_x + x }, { frame_y + y } uses more than one palette")
+
+            palette_id = palettes.pop()
+            if palette_id > 7:
+                raise ValueError(f"Object at { frame_x + x }, { frame_y + y } uses an invalid palette ({ palette_id })")
+
+            yield x, y, palette_id, bytes(c & 0xf for c in data)
+
+
+
+def pack_sprite_sheet(image, frame_width, frame_height, object_size=16, dedup=None):
+    """
+    Splits the sprite sheet into frames (left to right, then top to bottom) and deduplicates their objects.
+
+    Returns a list of frames, each one a list of ObjEntry.  The tiles are stored in `dedup.tiles`.
+    """
+
+    if object_size not in OBJECT_SIZES:
+        raise ValueError(f"Invalid object size: { object_size }")
+
+    if frame_width % object_size != 0 or frame_height % object_size != 0:
+        raise ValueError(f"Frame size MUST BE a multiple of { object_size }")
+
+    if image.width % frame_width != 0 or image.height % frame_height != 0:
+        raise ValueError('Image size MUST BE a multiple of the frame size')
+
+    if dedup is None:
+        dedup = TileDeduplicator(tile_size=object_size, bpp=BPP)
+
+    buffer = ImageBuffer(image)
+
+    if buffer.pixel_size != 1:
+        raise ValueError('Image must be indexed')
+
+    frames = list()
+
+    for frame_y in range(0, image.height, frame_height):
+        for frame_x in range(0, image.width, frame_width):
+            objects = list()
+
+            for x, y, palette_id, tile_data in extract_frame_objects(buffer, frame_x, frame_y,
+                                                                     frame_width, frame_height, object_size):
+                tile_id, hflip, vflip = dedup.add(tile_data)
+                objects.append(ObjEntry(x, y, tile_id, palette_id, hflip, vflip))
+
+            frames.append(objects)
+
+    return frames
+
+
+
+def character_number(tile_id, object_size):
+    # Returns the first character of a tile
+
+    if object_size == 16:
+        return (tile_id % 8) * 2 + (tile_id // 8) * 32
+    else:
+        return tile_id
+
+
+
+def create_obj_characters(tiles, object_size):
+    """
+    Returns the 8x8 px characters of the tileset, in VRAM order.
+
+    16x16 px tiles are split into the name table layout, with unused characters left blank.
+    """
+
+    if object_size == 8:
+        characters = [ bytes(t) for t in tiles ]
+    else:
+        if not tiles:
+            return list()
+
+        n_characters = character_number(len(tiles) - 1, object_size) + 18
+        blank = bytes(64)
+
+        characters = [ blank ] * n_characters
+
+        for tile_id, tile in enumerate(tiles):
+            c = character_number(tile_id, object_size)
+
+            for offset, part in zip((0, 1, 16, 17), split_large_tile(tile)):
+                characters[c + offset] = bytes(part)
+
+    if len(characters) > MAX_CHARACTERS:
+        raise ValueError(f"Too many OBJ characters ({ len(characters) }, max { MAX_CHARACTERS })")
+
+    return characters
+
+
+
+def create_metasprite_inc(frames, object_size, priority=3, origin=(0, 0), name='Metasprites', source=None):
+    """
+    Returns the metasprite table as the text of a bass include file.
+    """
+
+    lines = list()
+
+    lines.append(f"// Metasprites for `{ source }` (generated by sprite2snes.py, do not edit)" if source else
+                 '// Metasprites (generated by sprite2snes.py, do not edit)')
+    lines.append('//')
+    lines.append('// Each frame is a count byte followed by `count` 4 byte objects:')
+    lines.append('//   x offset (signed), y offset (signed), character, attributes (vhoopppN)')
+    lines.append('')
+    lines.append(f"namespace { name } {{")
+    lines.append('')
+    lines.append(f"constant FRAME_COUNT = { len(frames) }")
+    lines.append(f"constant OBJECT_SIZE = { object_size }")
+    lines.append('')
+    lines.append('FrameTable:')
+    for i in range(len(frames)):
+        lines.append(f"    dw  Frame{ i }")
+
+    origin_x, origin_y = origin
+
+    for i, objects in enumerate(frames):
+        lines.append('')
+        lines.append(f"Frame{ i }:")
+        lines.append(f"    db  { len(objects) }")
+
+        for o in objects:
+            x = o.x - origin_x
+            y = o.y - origin_y
+
+            if not (-128 <= x < 128 and -128 <= y < 128):
+                raise ValueError(f"Frame { i }: object offset out of range ({ x }, { y })")
+
+            char = character_number(o.tile_id, object_size)
+            attr = (bool(o.vflip) << 7) | (bool(o.hflip) << 6) | ((priority & 3) << 4) | (o.palette_id << 1) | (char >> 8)
+
+            lines.append(f"    db  { x }, { y }, 0x{ char & 0xff :02x}, 0x{ attr :02x}")
+
+    lines.append('}')
+    lines.append('')
+    lines.append('// vim: ft=bass-65816 ts=4 sw=4 et:')
+    lines.append('')
+
+    return '\n'.join(lines)
+
+
+
+def convert_sprite_sheet(image_filename, tileset_output, palette_output, metasprite_output,
+                         frame_size=None, object_size=16, flips='both', priority=3, origin=(0, 0), name='Metasprites',
+                         cache_dir=None, profiler=None):
+    """
+    Converts a sprite sheet png file and writes the tileset, palette and metasprite output files.
+
+    `frame_size` is a (width, height) tuple.  If it is None, the whole image is a single frame.
+
+    If `profiler` is not None, the time of each stage and the conversion counters are recorded.
+
+    Returns True if the outputs were copied from the conversion cache.
+    """
+
+    if profiler is None:
+        profiler = Profiler()
+
+    outputs = {
+        'tiles'       : tileset_output,
+        'palette'     : palette_output,
+        'metasprites' : metasprite_output,
+    }
+
+    cache = None
+    if cache_dir:
+        with profiler.stage('cache'):
+            cache = ConversionCache(cache_dir)
+            cache_key = cache.key('sprite2snes', [ image_filename ],
+                                  { 'frame_size': frame_size, 'object_size': object_size, 'flips': flips,
+                                    'priority': priority, 'origin': origin, 'name': name,
+                                    'source': os.path.basename(image_filename) })
+
+            if cache.fetch(cache_key, outputs):
+                profiler.count('cache_hits')
+                return True
+
+    with profiler.stage('decode'):
+        image = PIL.Image.open(image_filename)
+        image.load()
+
+    if frame_size is None:
+        frame_size = image.size
+
+    with profiler.stage('palette'):
+        palette = convert_palette(image.palette, 128)
+
+    dedup = TileDeduplicator(FLIP_MODES[flips], tile_size=object_size, bpp=BPP)
+
+    with profiler.stage('pack'):
+        frames = pack_sprite_sheet(image, frame_size[0], frame_size[1], object_size, dedup)
+
+    with profiler.stage('encode'):
+        characters = create_obj_characters(dedup.tiles, object_size)
+        tileset = convert_snes_tileset_fast(characters, BPP)
+
+    with profiler.stage('metasprites'):
+        metasprites = create_metasprite_inc(frames, object_size, priority, origin, name,
+                                            os.path.basename(image_filename)).encode('utf-8')
+
+    with profiler.stage('write'):
+        write_output_file(tileset_output, tileset)
+        write_output_file(palette_output, palette)
+        write_output_file(metasprite_output, metasprites)
+
+    count_dedup_stats(profiler, dedup)
+    profiler.count('frames', len(frames))
+    profiler.count('characters', len(characters))
+    profiler.count('bytes_written', len(tileset) + len(palette) + len(metasprites))
+
+    if cache:
+        with profiler.stage('cache'):
+            cache.store(cache_key, outputs)
+
+    return False
+
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+                description='Packs the frames of a sprite sheet into a 4bpp OBJ tileset and metasprite tables.')
+    parser.add_argument('-t', '--tileset-output', required=True,
+                        help='tileset output file')
+    parser.add_argument('-p', '--palette-output', required=True,
+                        help='palette output file')
+    parser.add_argument('-m', '--metasprite-output', required=True,
+                        help='metasprite table output file (bass include)')
+    parser.add_argument('-f', '--frame-size', required=False, type=parse_size,
+                        help='frame size (WIDTHxHEIGHT, default: the whole image)')
+    parser.add_argument('-s', '--object-size', required=False, type=int,
+                        choices=OBJECT_SIZES, default=16,
+                        help='object size in pixels (default: 16)')
+    parser.add_argument('--flips', required=False,
+                        choices=FLIP_MODES.keys(), default='both',
+                        help='tile flips to search when deduplicating objects (default: both)')
+    parser.add_argument('--priority', required=False, type=int,
+                        choices=range(4), default=3,
+                        help='object priority (default: 3)')
+    parser.add_argument('--origin', required=False, type=parse_position, default=(0, 0),
+                        help='frame origin, the object offsets are relative to it (X,Y, default: 0,0)')
+    parser.add_argument('--name', required=False, default='Metasprites',
+                        help='namespace of the metasprite table (default: Metasprites)')
+    parser.add_argument('--cache-dir', required=False,
+                        help='conversion cache directory')
+    parser.add_argument('--profile', action='store_true',
+                        help='print the time of each stage and the conversion counters')
+    parser.add_argument('--stats-json', required=False,
+                        help='write the stage times and conversion counters to a JSON file')
+    parser.add_argument('image_filename', action='store',
+                        help='Indexed png sprite sheet')
+
+    return parser.parse_args()
+
+
+
+def main():
+    args = parse_arguments()
+
+    profiler = Profiler()
+
+    convert_sprite_sheet(args.image_filename, args.tileset_output, args.palette_output, args.metasprite_output,
+                         args.frame_size, args.object_size, args.flips, args.priority, args.origin, args.name,
+                         args.cache_dir, profiler)
+
+    if args.profile:
+        profiler.report()
+
+    if args.stats_json:
+        profiler.write_json(args.stats_json)
+
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim: set fenc=utf-8 ai ts=4 sw=4 sts=4 et:
+#
+#
+# SPDX-FileCopyrightText: © 2026 Marcus Rowe <undisbeliever@gmail.com>
+# SPDX-License-Identifier: Zlib
+#
+# Copyright © 2026 Marcus Rowe <undisbeliever@gmail.com>
+#
+# This software is provided 'as-is', without any express or implied warranty.
+# In no event will the authors be held liable for any damages arising from the
+# use of this software.
+#
+# Permission is granted to anyone to use this software for any purpose, including
+# commercial applications, and to alter it and redistribute it freely, subject to
+# the following restrictions:
+#
+#    1. The origin of this software must not be misrepresented; you must not
+#       claim that you wrote the original software. If you use this software in
+#       a product, an acknowledgment in the product documentation would be
+#       appreciated but is not required.
+#
+#    2. Altered source versions must be plainly marked as such, and must not be
+#       misrepresented as being the original software.
+#
+#    3. This notice may not be removed or altered from any source distribution.
+
+
+
+
+# Splits the VRAM and CGRAM uploads of generated resources into chunks that fit in VBlank.
+#
+# Each transfer is a converter output file (tileset, tilemap or palette), the label it is
+# inserted at and its destination address.  The transfers are split into chunks, in order,
+# so that no more than `budget` bytes are transferred in a single frame.
+#
+# The schedule is written as a bass include file, containing a table of frames.  Each frame
+# is a list of chunks, terminated by a 0 length:
+#
+#   dw  length, dl  source address, db  target, dw  VRAM word address or CGRAM colour index
+#
+# The source data must not cross a bank boundary and must be uncompressed.
+
+
+import argparse
+import os.path
+from collections import namedtuple
+
+from _cache import write_output_file
+
+
+# A conservative NTSC VBlank DMA budget (about 6 KiB can be transferred in VBlank, less the
+# NMI handler overhead and the OAM transfer).
+DEFAULT_BUDGET = 4096
+
+# Maximum chunk length (the length is a 16 bit word)
+MAX_BUDGET = 0xffff
+
+# target -> (id, size of the destination address space in bytes)
+TARGETS = {
+    'vram'  : (0, 0x10000),
+    'cgram' : (1, 0x200),
+}
+
+
+Transfer = namedtuple('Transfer', ('target', 'label', 'size', 'address'))
+Chunk = namedtuple('Chunk', ('target', 'label', 'offset', 'address', 'length'))
+
+
+
+def read_transfer(target, label, filename, address):
+    """ Returns a Transfer of the file `filename` (inserted at `label`) to `address` """
+
+    if target not in TARGETS:
+        raise ValueError(f"Unknown transfer target: { target }")
+
+    size = os.path.getsize(filename)
+    address = int(address, 0)
+
+    if size % 2 != 0:
+        raise ValueError(f"{ filename }: size MUST BE even")
+
+    if address < 0 or address * 2 + size > TARGETS[target][1]:
+        raise ValueError(f"{ filename }: does not fit in { target.upper() } at 0x{ address :04x}")
+
+    return Transfer(target, label, size, address)
+
+
+
+def plan_transfers(transfers, budget, alignment=2):
+    """
+    Splits the transfers into chunks of at most `budget` bytes per frame.
+
+    Chunks start and end on a multiple of `alignment` bytes (except for the last chunk of each transfer).
+
+    Returns a list of frames, each frame is a list of Chunks.
+    """
+
+    if alignment < 2 or alignment % 2 != 0:
+        raise ValueError('alignment MUST BE a positive multiple of 2')
+
+    if budget < alignment:
+        raise ValueError(f"budget MUST BE at least { alignment } bytes")
+
+    if budget > MAX_BUDGET:
+        raise ValueError(f"budget MUST BE at most { MAX_BUDGET } bytes")
+
+    frames = [ list() ]
+    remaining = budget
+
+    for t in transfers:
+        offset = 0
+
+        while offset < t.size:
+            length = min(t.size - offset, remaining - remaining % alignment)
+
+            if length == 0:
+                frames.append(list())
+                remaining = budget
+                continue
+
+            frames[-1].append(Chunk(t.target, t.label, offset, t.address + offset // 2, length))
+
+            offset += length
+            remaining -= length
+
+    if not frames[-1]:
+        frames.pop()
+
+    return frames
+
+
+
+def _plural(n, word):
+    return f"{ n } { word }" if n == 1 else f"{ n } { word }s"
+
+
+
+def dma_schedule_inc(frames, budget, name='DmaSchedule'):
+    """ Returns the schedule as the text of a bass include file. """
+
+    n_bytes = sum(c.length for f in frames for c in f)
+
+    lines = list()
+
+    lines.append('// VBlank DMA schedule (generated by vblank-dma-schedule.py, do not edit)')
+    lines.append('//')
+    lines.append('// Each frame is a list of chunks, terminated by a 0 length:')
+    lines.append('//   dw length, dl source address, db target, dw VRAM word address or CGRAM colour index')
+    lines.append('//')
+    lines.append(f"// { _plural(len(frames), 'frame') }, { n_bytes } bytes")
+    lines.append('')
+    lines.append(f"namespace { name } {{")
+    lines.append('')
+    lines.append(f"constant FRAME_COUNT = { len(frames) }")
+    lines.append(f"constant BYTES_PER_FRAME = { budget }")
+    lines.append('')
+    for target, (target_id, size) in TARGETS.items():
+        lines.append(f"constant TARGET_{ target.upper() } = { target_id }")
+    lines.append('')
+    lines.append('FrameTable:')
+    for i in range(len(frames)):
+        lines.append(f"    dw  Frame{ i }")
+
+    for i, chunks in enumerate(frames):
+        lines.append('')
+        lines.append(f"Frame{ i }:")
+
+        for c in chunks:
+            lines.append(f"    dw  { c.length }")
+            lines.append(f"    dl  { c.label } + 0x{ c.offset :04x}")
+            lines.append(f"    db  TARGET_{ c.target.upper() }")
+            lines.append(f"    dw  0x{ c.address :04x}")
+
+        lines.append('    dw  0')
+
+    lines.append('}')
+    lines.append('')
+    lines.append('// vim: ft=bass-65816 ts=4 sw=4 et:')
+    lines.append('')
+
+    return '\n'.join(lines)
+
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+                description='Splits VRAM and CGRAM uploads into chunks that fit in VBlank and writes a DMA schedule.')
+    parser.add_argument('-t', '--transfer', required=True, action='append', nargs=4,
+                        metavar=('TARGET', 'LABEL', 'FILE', 'ADDRESS'),
+                        help='transfer FILE (inserted at LABEL) to ADDRESS (TARGET is vram or cgram, '
+                             'ADDRESS is a VRAM word address or CGRAM colour index).  Can be repeated.')
+    parser.add_argument('-o', '--output', required=True,
+                        help='schedule output file')
+    parser.add_argument('-b', '--budget', required=False, type=int, default=DEFAULT_BUDGET,
+                        help=f"maximum number of bytes transferred per frame (default: { DEFAULT_BUDGET })")
+    parser.add_argument('-a', '--align', required=False, type=int, default=2,
+                        help='chunk alignment in bytes, ie, the tile size (default: 2)')
+    parser.add_argument('--name', required=False, default='DmaSchedule',
+                        help='namespace of the schedule (default: DmaSchedule)')
+
+    return parser.parse_args()
+
+
+
+def main():
+    args = parse_arguments()
+
+    transfers = [ read_transfer(*t) for t in args.transfer ]
+
+    frames = plan_transfers(transfers, args.budget, args.align)
+
+    write_output_file(args.output, dma_schedule_inc(frames, args.budget, args.name).encode('utf-8'))
+
+    n_bytes = sum(t.size for t in transfers)
+    print(f"{ n_bytes } bytes in { _plural(len(frames), 'frame') } ({ args.budget } bytes per frame)")
+
+
+
+if __name__ == '__main__':
+    main()
+
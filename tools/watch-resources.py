@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim: set fenc=utf-8 ai ts=4 sw=4 sts=4 et:
+#
+#
+# SPDX-FileCopyrightText: © 2026 Marcus Rowe <undisbeliever@gmail.com>
+# SPDX-License-Identifier: Zlib
+#
+# Copyright © 2026 Marcus Rowe <undisbeliever@gmail.com>
+#
+# This software is provided 'as-is', without any express or implied warranty.
+# In no event will the authors be held liable for any damages arising from the
+# use of this software.
+#
+# Permission is granted to anyone to use this software for any purpose, including
+# commercial applications, and to alter it and redistribute it freely, subject to
+# the following restrictions:
+#
+#    1. The origin of this software must not be misrepresented; you must not
+#       claim that you wrote the original software. If you use this software in
+#       a product, an acknowledgment in the product documentation would be
+#       appreciated but is not required.
+#
+#    2. Altered source versions must be plainly marked as such, and must not be
+#       misrepresented as being the original software.
+#
+#    3. This notice may not be removed or altered from any source distribution.
+
+
+# Watches the resource files in a manifest (see `_jobs.py`) and reconverts the
+# resources that changed.
+#
+# The converters stay loaded between conversions and the input files are polled
+# for changes (which works on every platform and filesystem).
+
+
+import argparse
+import os
+import sys
+import time
+
+from _jobs import read_manifest, run_job, job_input_files
+
+
+
+def _mtime(filename):
+    try:
+        st = os.stat(filename)
+        return st.st_mtime_ns, st.st_size
+    except OSError:
+        return None
+
+
+
+class ResourceWatcher:
+    def __init__(self, manifest_filename, cache_dir=None):
+        self.manifest_filename = manifest_filename
+        self.cache_dir = cache_dir
+
+        self.manifest_mtime = None
+
+        # input filename -> list of jobs that read it
+        self.jobs_for_file = dict()
+        # input filename -> mtime when last checked
+        self.mtimes = dict()
+
+
+    def load_manifest(self):
+        # The job list is only replaced if the whole manifest was read successfully
+        self.manifest_mtime = _mtime(self.manifest_filename)
+
+        jobs_for_file = dict()
+
+        for job in read_manifest(self.manifest_filename):
+            for f in job_input_files(job):
+                jobs_for_file.setdefault(f, list()).append(job)
+
+        self.jobs_for_file = jobs_for_file
+        self.mtimes = { f: _mtime(f) for f in self.jobs_for_file }
+
+        print(f"Watching { len(self.jobs_for_file) } files")
+
+
+    def changed_jobs(self):
+        """ Returns the jobs that read a file that has changed since the last call. """
+
+        jobs = list()
+
+        for f, old_mtime in self.mtimes.items():
+            mtime = _mtime(f)
+
+            if mtime != old_mtime:
+                self.mtimes[f] = mtime
+
+                if mtime is not None:
+                    for j in self.jobs_for_file[f]:
+                        if j not in jobs:
+                            jobs.append(j)
+
+        return jobs
+
+
+    def poll(self):
+        """ Reconverts the resources that changed.  Returns the number of jobs that were run. """
+
+        if _mtime(self.manifest_filename) != self.manifest_mtime:
+            try:
+                self.load_manifest()
+            except (OSError, ValueError) as e:
+                # The manifest may be missing or half-written, it is reread when its mtime changes
+                print(f"{ self.manifest_filename }: { e }", file=sys.stderr)
+
+        jobs = self.changed_jobs()
+
+        for j in jobs:
+            result = run_job(j, self.cache_dir)
+
+            if result['status'] == 'ok':
+                print(f"{ result['input'] }: { result['seconds'] * 1000:.1f} ms")
+            else:
+                print(f"{ result['input'] }: { result['error'] }", file=sys.stderr)
+
+            sys.stdout.flush()
+
+        return len(jobs)
+
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+                description='Watches the png resources in a manifest file and reconverts them when they change.')
+
+    parser.add_argument('-i', '--interval', type=float, default=0.1,
+                        help='polling interval in seconds (default: 0.1)')
+    parser.add_argument('--all', action='store_true',
+                        help='convert all resources on startup')
+    parser.add_argument('--cache-dir', required=False,
+                        help='conversion cache directory')
+    parser.add_argument('manifest', action='store',
+                        help='manifest file (.json or .jsonl)')
+
+    return parser.parse_args()
+
+
+
+def main():
+    args = parse_arguments()
+
+    watcher = ResourceWatcher(args.manifest, args.cache_dir)
+    watcher.load_manifest()
+
+    if args.all:
+        watcher.mtimes = dict.fromkeys(watcher.mtimes)
+
+    try:
+        while True:
+            watcher.poll()
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
+
+
+
+if __name__ == '__main__':
+    main()
+
@@ -9,7 +9,9 @@
 # This script is intended to be used on homebrew SNES executables that were
 # created with my `snes_header.inc` include file.
 #
-# WARNING: This script will modify the input file.
+# WARNING: This script will modify the input file (unless `--verify` is used).
+#
+# Multiple sfc files (or directories of sfc files) can be processed in parallel.
 #
 #
 # SPDX-FileCopyrightText: © 2022 Marcus Rowe <undisbeliever@gmail.com>
@@ -38,26 +40,67 @@
 
 import os.path
 import sys
+import mmap
 import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from _profile import Profiler
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 
 MIN_ROM_SIZE = 64 * 1024
 MAX_ROM_SIZE = 4 * 1024 * 1024
 
+CHUNK_SIZE = 64 * 1024
+
+CHECKSUM_PLACEHOLDER = b'\xaa\xaa\x55\x55'
+
+# Size of the internal header (from `header_offset` to the end of the checksum)
+HEADER_SIZE = 0x30
+
+# Mapping name -> (bank_size, header_offset, expected_map_mode)
+MAPPINGS = {
+    'lorom': (32 * 1024, 0x007fb0, 0x20),
+    'hirom': (64 * 1024, 0x00ffb0, 0x21),
+}
 
 
-def check_header_exists(rom_data, header_offset, expected_map_mode):
+
+def sum_bytes(data):
+    """
+    Returns the sum of all bytes in the bytes-like object `data`.
+
+    The data is not copied.  It is summed with NumPy (if installed) or in fixed-size memoryview chunks.
+    """
+
+    with memoryview(data) as view:
+        if numpy is not None:
+            return int(numpy.frombuffer(view, dtype=numpy.uint8).sum(dtype=numpy.uint64))
+
+        total = 0
+        for i in range(0, len(view), CHUNK_SIZE):
+            total += sum(view[i : i + CHUNK_SIZE])
+
+        return total
+
+
+
+def check_header_exists(rom_data, header_offset, expected_map_mode, allow_written_checksum=False):
     """
     Checks that `rom_data` contains an unaltered header that is created by `snes_header.inc`.
 
+    If `allow_written_checksum` is True, the checksum bytes are not checked.
+
     Returns true if header matches expected values
     """
 
     # snes_header.inc creates a header with a blank maker code, blank game code and no expansion chips.
     EXPECTED_START = (6 * b'\x20') + bytes(7)
 
-    EXPECTED_CHECKSUM = b'\xaa\xaa\x55\x55'
-
 
     if rom_data[header_offset : header_offset + 13] != EXPECTED_START:
         return False
@@ -69,24 +112,17 @@ def check_header_exists(rom_data, header_offset, expected_map_mode):
         return False
 
     # Do not write to files that have changed the checksum bytes (from what is defined in `snes_header`.inc`).
-    if rom_data[header_offset + 0x2c : header_offset + 0x30] != EXPECTED_CHECKSUM:
-        return False
+    if not allow_written_checksum:
+        if rom_data[header_offset + 0x2c : header_offset + 0x30] != CHECKSUM_PLACEHOLDER:
+            return False
 
 
     return True
 
 
 
-def calculate_checksum(rom_data, bank_size, header_offset, expected_map_mode):
-    """
-    Calculate checksum.
-
-    Throws an exception if input is invalid.
-
-    Returns *bytes of length 4* containing checksum and checksum complement.
-    """
-
-    rom_size = len(rom_data)
+def check_rom_size(rom_size, bank_size):
+    """ Throws an exception if `rom_size` is invalid. """
 
     # Confirm there is no copier header
     if rom_size % bank_size != 0:
@@ -100,10 +136,13 @@ def calculate_checksum(rom_data, bank_size, header_offset, expected_map_mode):
         raise RuntimeError(f"sfc file is too large (max { MAX_ROM_SIZE // 1024 } KiB).")
 
 
-    # Confirm there is an SFC header in this file
-    if not check_header_exists(rom_data, header_offset, expected_map_mode):
-        raise RuntimeError('Could not find header.  Header must match `snes_header.inc` (and the checksum bytes MUST be unmodified).  Is the --hirom/--lorom argument correct?')
 
+def rom_chip_layout(rom_size, bank_size):
+    """
+    Returns a tuple of (size of the first part, number of times the second part is repeated in the checksum).
+
+    Throws an exception if the ROM cannot fit on 2 power-of-two ROM chips.
+    """
 
     # Check if a cartridge can be created with 2 power-of-two ROM chips
     if rom_size.bit_count() > 2:
@@ -111,28 +150,59 @@ def calculate_checksum(rom_data, bank_size, header_offset, expected_map_mode):
 
 
     if rom_size.bit_count() == 1:
-        checksum = sum(rom_data)
-    else:
-        # If the sfc file is not a power of two, it is split in two.
-        # The first part contains the largest power-of-two bytes.
-        # The second part is repeated until the ROM size is a power-of-two.
+        return rom_size, 0
 
-        largest_power_of_two = 1 << (rom_size.bit_length() - 1)
+    # If the sfc file is not a power of two, it is split in two.
+    # The first part contains the largest power-of-two bytes.
+    # The second part is repeated until the ROM size is a power-of-two.
 
-        if largest_power_of_two <= bank_size:
-            # The "Remove old checksum" code below will only work correctly if the checksum is in the first part.
-            raise RuntimeError("sfc file is too small.")
+    largest_power_of_two = 1 << (rom_size.bit_length() - 1)
 
-        first_part_checksum = sum(rom_data[0:largest_power_of_two])
+    if largest_power_of_two <= bank_size:
+        # The "Remove old checksum" code below will only work correctly if the checksum is in the first part.
+        raise RuntimeError("sfc file is too small.")
 
+    remaining = rom_size - largest_power_of_two
+    assert(remaining > 0)
+    assert(remaining.bit_count() == 1)
+    assert(largest_power_of_two % remaining == 0)
 
-        remaining = rom_size - largest_power_of_two
-        assert(remaining > 0)
-        assert(remaining.bit_count() == 1)
-        assert(largest_power_of_two % remaining == 0)
+    return largest_power_of_two, largest_power_of_two // remaining
 
-        remaining_checksum = sum(rom_data[largest_power_of_two:])
-        remaining_count = largest_power_of_two // remaining
+
+
+def calculate_checksum(rom_data, bank_size, header_offset, expected_map_mode, allow_written_checksum=False):
+    """
+    Calculate checksum.
+
+    If `allow_written_checksum` is True, the ROM may already contain a checksum (for verification).
+
+    Throws an exception if input is invalid.
+
+    Returns *bytes of length 4* containing checksum and checksum complement.
+    """
+
+    rom_size = len(rom_data)
+
+    check_rom_size(rom_size, bank_size)
+
+
+    # Confirm there is an SFC header in this file
+    if not check_header_exists(rom_data, header_offset, expected_map_mode, allow_written_checksum):
+        raise RuntimeError('Could not find header.  Header must match `snes_header.inc` (and the checksum bytes MUST be unmodified).  Is the --hirom/--lorom argument correct?')
+
+
+    largest_power_of_two, remaining_count = rom_chip_layout(rom_size, bank_size)
+
+    if largest_power_of_two == rom_size:
+        checksum = sum_bytes(rom_data)
+    else:
+        rom_view = memoryview(rom_data)
+
+        first_part_checksum = sum_bytes(rom_view[0:largest_power_of_two])
+        remaining_checksum = sum_bytes(rom_view[largest_power_of_two:])
+
+        rom_view.release()
 
 
         checksum = first_part_checksum + remaining_checksum * remaining_count
@@ -157,25 +227,190 @@ def calculate_checksum(rom_data, bank_size, header_offset, expected_map_mode):
 
 
 
-def write_sfc_checksum(sfc_filename, bank_size, header_offset, expected_map_mode):
+def update_checksum(old_checksum, rom_size, bank_size, header_offset, patches):
     """
-    Calculates and writes the checksum for `sfc_filename`.
-    Throws an exception on error.
+    Calculates the new checksum of a patched ROM from the old checksum and the patched bytes.
+
+    `old_checksum` is the 16 bit checksum of the unpatched ROM.
+    `patches` is a list of (offset, old bytes, new bytes) tuples.  The patches must not overlap
+    each other or the internal header (which includes the checksum and checksum complement).
+
+    Throws an exception if input is invalid.
+
+    Returns *bytes of length 4* containing checksum and checksum complement.
     """
 
+    check_rom_size(rom_size, bank_size)
+
+    largest_power_of_two, remaining_count = rom_chip_layout(rom_size, bank_size)
+
+    header_end = header_offset + HEADER_SIZE
+
+    delta = 0
+
+    for offset, old_bytes, new_bytes in patches:
+        if len(old_bytes) != len(new_bytes):
+            raise RuntimeError(f"patch at 0x{ offset:06x}: old and new bytes have different lengths")
+
+        if offset < 0 or offset + len(new_bytes) > rom_size:
+            raise RuntimeError(f"patch at 0x{ offset:06x}: out of bounds")
+
+    # Every patch delta is calculated from the unpatched bytes
+    ranges = sorted((offset, offset + len(new_bytes)) for offset, old_bytes, new_bytes in patches if new_bytes)
+    for (a_start, a_end), (b_start, b_end) in zip(ranges, ranges[1:]):
+        if b_start < a_end:
+            raise RuntimeError(f"patch at 0x{ b_start:06x}: overlaps the patch at 0x{ a_start:06x}")
+
+    # A patched header would be overwritten by the checksum (or fail the header check after it is written)
+    for start, end in ranges:
+        if start < header_end and header_offset < end:
+            raise RuntimeError(f"patch at 0x{ start:06x}: overlaps the internal header at 0x{ header_offset:06x}")
+
+    for offset, old_bytes, new_bytes in patches:
+        for addr, o, n in zip(range(offset, offset + len(new_bytes)), old_bytes, new_bytes):
+            if addr < largest_power_of_two:
+                delta += n - o
+            else:
+                # Bytes in the second part are mirrored `remaining_count` times
+                delta += (n - o) * remaining_count
+
+
+    checksum = (old_checksum + delta) & 0xffff
+    complement = checksum ^ 0xffff
+
+    return (complement.to_bytes(2, byteorder='little', signed=False)
+            + checksum.to_bytes(2, byteorder='little', signed=False))
+
+
+
+def _check_sfc_file(sfc_filename, fp):
+    # Returns the file size
+
     ext = os.path.splitext(sfc_filename)[1]
     if ext != '.sfc':
         raise RuntimeError('Expected a file with a .sfc extension')
 
+    file_size = os.fstat(fp.fileno()).st_size
+
+    if file_size > MAX_ROM_SIZE:
+        raise RuntimeError(f"sfc file is too large (max { MAX_ROM_SIZE // 1024 } KiB).")
+
+    return file_size
+
+
+
+def write_sfc_checksum(sfc_filename, bank_size, header_offset, expected_map_mode, profiler=None):
+    """
+    Calculates and writes the checksum for `sfc_filename`.
+    Throws an exception on error.
+    """
+
+    if profiler is None:
+        profiler = Profiler()
+
+    with open(sfc_filename, 'r+b') as fp:
+        file_size = _check_sfc_file(sfc_filename, fp)
+
+        if file_size == 0:
+            # Cannot mmap an empty file (calculate_checksum will raise an exception)
+            calculate_checksum(bytes(), bank_size, header_offset, expected_map_mode)
+
+        with mmap.mmap(fp.fileno(), 0) as rom_data:
+            with profiler.stage('checksum'):
+                checksum_bytes = calculate_checksum(rom_data, bank_size, header_offset, expected_map_mode)
+
+            profiler.count('bytes_summed', file_size)
+
+            # Write checksum
+            with profiler.stage('write'):
+                rom_data[header_offset + 0x2c : header_offset + 0x30] = checksum_bytes
+                rom_data.flush()
+
+            profiler.count('bytes_written', len(checksum_bytes))
+
+
+
+def verify_sfc_checksum(sfc_filename, bank_size, header_offset, expected_map_mode, profiler=None):
+    """
+    Verifies the checksum and checksum complement of `sfc_filename` without modifying the file.
+    Throws an exception if the file is invalid.
+
+    Returns a tuple of (stored checksum bytes, expected checksum bytes).
+    """
+
+    if profiler is None:
+        profiler = Profiler()
+
+    with open(sfc_filename, 'rb') as fp:
+        file_size = _check_sfc_file(sfc_filename, fp)
+
+        if file_size == 0:
+            # Cannot mmap an empty file (calculate_checksum will raise an exception)
+            calculate_checksum(bytes(), bank_size, header_offset, expected_map_mode, True)
+
+        with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as rom_data:
+            with profiler.stage('checksum'):
+                expected = calculate_checksum(rom_data, bank_size, header_offset, expected_map_mode, True)
+                stored = rom_data[header_offset + 0x2c : header_offset + 0x30]
+
+            profiler.count('bytes_summed', file_size)
+
+    return stored, expected
+
+
+
+def patch_sfc_file(sfc_filename, bank_size, header_offset, expected_map_mode, patches):
+    """
+    Applies `patches` to `sfc_filename` and updates the checksum without re-summing the ROM.
+
+    `patches` is a list of (offset, old bytes, new bytes) tuples.
+    If old bytes is None it is read from the file, otherwise it must match the file contents.
+
+    The ROM must already contain a valid checksum.  Throws an exception on error
+    (the file is not modified if there is an error).
+    """
 
     with open(sfc_filename, 'r+b') as fp:
-        rom_data = fp.read(MAX_ROM_SIZE)
+        rom_size = _check_sfc_file(sfc_filename, fp)
+
+        check_rom_size(rom_size, bank_size)
+
+        fp.seek(header_offset)
+        header = fp.read(HEADER_SIZE)
+
+        if not check_header_exists(header, 0, expected_map_mode, True):
+            raise RuntimeError('Could not find header.  Header must match `snes_header.inc`.  Is the --hirom/--lorom argument correct?')
 
-        # Test if fp is not at the end of the file
-        if fp.read(1):
-            raise RuntimeError(f"sfc file is too large (max { MAX_ROM_SIZE // 1024 } KiB).")
+        complement = int.from_bytes(header[0x2c:0x2e], byteorder='little')
+        old_checksum = int.from_bytes(header[0x2e:0x30], byteorder='little')
 
-        checksum_bytes = calculate_checksum(rom_data, bank_size, header_offset, expected_map_mode)
+        if complement ^ old_checksum != 0xffff:
+            raise RuntimeError('sfc file does not contain a valid checksum')
+
+
+        file_patches = list()
+
+        for offset, old_bytes, new_bytes in patches:
+            if old_bytes is not None and len(old_bytes) != len(new_bytes):
+                raise RuntimeError(f"patch at 0x{ offset:06x}: old and new bytes have different lengths")
+
+            if offset < 0 or offset + len(new_bytes) > rom_size:
+                raise RuntimeError(f"patch at 0x{ offset:06x}: out of bounds")
+
+            fp.seek(offset)
+            file_bytes = fp.read(len(new_bytes))
+
+            if old_bytes is not None and bytes(old_bytes) != file_bytes:
+                raise RuntimeError(f"patch at 0x{ offset:06x}: old bytes do not match the sfc file ({ file_bytes.hex() })")
+
+            file_patches.append((offset, file_bytes, new_bytes))
+
+
+        checksum_bytes = update_checksum(old_checksum, rom_size, bank_size, header_offset, file_patches)
+
+        for offset, old_bytes, new_bytes in file_patches:
+            fp.seek(offset)
+            fp.write(new_bytes)
 
         # Write checksum
         fp.seek(header_offset + 0x2c)
@@ -183,6 +418,93 @@ def write_sfc_checksum(sfc_filename, bank_size, header_offset, expected_map_mode
 
 
 
+def parse_patch(s):
+    """ Parses a `OFFSET:NEW_HEX` or `OFFSET:OLD_HEX:NEW_HEX` patch argument. """
+
+    fields = s.split(':')
+
+    try:
+        if len(fields) == 2:
+            return int(fields[0], 0), None, bytes.fromhex(fields[1])
+        elif len(fields) == 3:
+            return int(fields[0], 0), bytes.fromhex(fields[1]), bytes.fromhex(fields[2])
+    except ValueError:
+        pass
+
+    raise argparse.ArgumentTypeError(f"invalid patch: { s } (expected OFFSET:NEW_HEX or OFFSET:OLD_HEX:NEW_HEX)")
+
+
+
+def process_sfc_file(sfc_filename, mapping, verify):
+    """
+    Writes (or verifies) the checksum of a single sfc file.
+
+    Returns a tuple of (sfc_filename, ok, message, profiler statistics dict).
+    This function does not raise exceptions.
+    """
+
+    bank_size, header_offset, expected_map_mode = MAPPINGS[mapping]
+
+    profiler = Profiler()
+    profiler.count('files')
+
+    try:
+        if verify:
+            stored, expected = verify_sfc_checksum(sfc_filename, bank_size, header_offset, expected_map_mode, profiler)
+
+            if stored == expected:
+                ok, message = True, 'OK'
+            elif stored == CHECKSUM_PLACEHOLDER:
+                ok, message = False, 'FAILED (checksum has not been written)'
+            else:
+                ok, message = False, f"FAILED (checksum is { stored.hex() }, expected { expected.hex() })"
+        else:
+            write_sfc_checksum(sfc_filename, bank_size, header_offset, expected_map_mode, profiler)
+            ok, message = True, 'OK'
+
+    except Exception as e:
+        ok, message = False, f"FAILED ({ e })"
+
+    if not ok:
+        profiler.count('failed')
+
+    return sfc_filename, ok, message, profiler.to_dict()
+
+
+
+def find_sfc_files(paths):
+    """ Returns the sfc files in `paths`.  Directories are searched recursively. """
+
+    out = list()
+
+    for p in paths:
+        if os.path.isdir(p):
+            for dirpath, dirnames, filenames in os.walk(p):
+                dirnames.sort()
+                out.extend(os.path.join(dirpath, f) for f in sorted(filenames) if f.endswith('.sfc'))
+        else:
+            out.append(p)
+
+    return out
+
+
+
+def process_sfc_files(sfc_filenames, mapping, verify, n_processes=None):
+    """ Writes (or verifies) the checksums of multiple sfc files in parallel.  Returns a list of results. """
+
+    if not n_processes:
+        n_processes = os.cpu_count() or 1
+
+    n = len(sfc_filenames)
+
+    if n_processes == 1 or n <= 1:
+        return [ process_sfc_file(f, mapping, verify) for f in sfc_filenames ]
+    else:
+        with ProcessPoolExecutor(max_workers=min(n_processes, n)) as executor:
+            return list(executor.map(process_sfc_file, sfc_filenames, [ mapping ] * n, [ verify ] * n))
+
+
+
 def parse_arguments():
     parser = argparse.ArgumentParser(
                 allow_abbrev=False,
@@ -195,8 +517,20 @@ def parse_arguments():
     mgroup.add_argument('--hirom', action="store_true",
                         help='sfc file uses HIROM mapping')
 
-    parser.add_argument('sfc_filename', action='store',
-                        help='sfc file (MODIFIED IN PLACE)')
+    parser.add_argument('--verify', action='store_true',
+                        help='verify the checksum without modifying the sfc files')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='number of worker processes (default: number of CPUs)')
+    parser.add_argument('--profile', action='store_true',
+                        help='print the time of each stage and the counters (summed over all files)')
+    parser.add_argument('--stats-json', required=False,
+                        help='write the stage times and counters (summed over all files) to a JSON file')
+    parser.add_argument('--patch', action='append', type=parse_patch, metavar='OFFSET:[OLD_HEX:]NEW_HEX',
+                        help='patch the (already checksummed) sfc file and update the checksum from the patched bytes.'
+                             '  Can be used multiple times.')
+
+    parser.add_argument('sfc_filenames', action='store', nargs='+', metavar='sfc_filename',
+                        help='sfc file or directory of sfc files (MODIFIED IN PLACE)')
 
 
     # Print full help message if there is no arguments
@@ -212,15 +546,48 @@ def main():
     args = parse_arguments()
 
     if args.lorom:
-        write_sfc_checksum(args.sfc_filename, 32 * 1024, 0x007fb0, 0x20)
+        mapping = 'lorom'
     elif args.hirom:
-        write_sfc_checksum(args.sfc_filename, 64 * 1024, 0x00ffb0, 0x21)
+        mapping = 'hirom'
     else:
         raise RuntimeError("Unknown mapping type")
 
+    if args.patch:
+        if args.verify or len(args.sfc_filenames) != 1:
+            sys.exit('--patch requires a single sfc file and cannot be used with --verify')
 
+        try:
+            patch_sfc_file(args.sfc_filenames[0], *MAPPINGS[mapping], args.patch)
+        except Exception as e:
+            sys.exit(f"{ args.sfc_filenames[0] }: FAILED ({ e })")
+        return
 
-if __name__ == '__main__':
-    main()
+    sfc_filenames = find_sfc_files(args.sfc_filenames)
+
+    results = process_sfc_files(sfc_filenames, mapping, args.verify, args.jobs)
+
+    n_failed = 0
+    profiler = Profiler()
+
+    for sfc_filename, ok, message, stats in results:
+        profiler.merge(stats)
+
+        if not ok:
+            n_failed += 1
+            print(f"{ sfc_filename }: { message }", file=sys.stderr)
+        elif args.verify or len(results) > 1:
+            print(f"{ sfc_filename }: { message }")
+
+    if args.profile:
+        profiler.report()
 
+    if args.stats_json:
+        profiler.write_json(args.stats_json)
 
+    if n_failed:
+        sys.exit(f"{ n_failed } of { len(results) } sfc files failed")
+
+
+
+if __name__ == '__main__':
+    main()